@@ -1,19 +1,23 @@
 import os
-import json
 import sys
+import orjson
 from datetime import datetime, timezone
+from pathlib import Path
 from dotenv import load_dotenv
 
+EXAMPLES_DIR = Path(__file__).resolve().parents[1]
+ROOT_DIR = Path(__file__).resolve().parents[2]
+
 # Load environment variables from .env file
-load_dotenv(os.path.join(os.path.dirname(__file__), '../.env'))
+load_dotenv(EXAMPLES_DIR / '.env')
 
 # Add generated code to Python path
-generated_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../generated/python'))
+generated_dir = str(ROOT_DIR / 'generated' / 'python')
 if generated_dir not in sys.path:
     sys.path.insert(0, generated_dir)
 
 # Import generated modules
-sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+sys.path.append(str(ROOT_DIR))
 from generated.python.models import BillEvent
 from generated.python.marshaller import BillEventMarshaller
 from generated.python.event_bridge_publisher import BillEventPublisher
@@ -21,9 +25,9 @@ from generated.python.event_bridge_publisher import BillEventPublisher
 
 def load_event() -> BillEvent:
     """Load bill event from JSON file"""
-    json_path = os.path.join(os.path.dirname(__file__), '../billApprovedEvent.json')
-    with open(json_path, 'r') as f:
-        event_data = json.load(f)
+    json_path = EXAMPLES_DIR / 'billApprovedEvent.json'
+    with open(json_path, 'rb') as f:
+        event_data = orjson.loads(f.read())
     
     # Use the marshaller to convert JSON to BillEvent
     return BillEventMarshaller.from_dict(event_data)
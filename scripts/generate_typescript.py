@@ -1,169 +1,435 @@
 #!/usr/bin/env python3
 
+import argparse
+import hashlib
+import multiprocessing
 import os
+import pickle
+import tempfile
 import yaml
-from typing import Dict, Any, List
+from concurrent.futures import ThreadPoolExecutor
+from graphlib import TopologicalSorter
+from pathlib import Path
+from typing import Callable, Dict, Any, Final, List, NamedTuple, Optional, Set, TextIO, Tuple
 import json
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, Template
+
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:  # PyYAML built without libyaml
+    from yaml import SafeLoader
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+ROOT_DIR = SCRIPT_DIR.parent
+TEMPLATE_DIR = SCRIPT_DIR / 'templates'
+FINGERPRINT_FILE = '.fingerprint'
+MODULE_FILES = ('common.ts', 'models.ts', 'validator.ts', 'marshaller.ts', 'unmarshaller.ts')
+BUNDLE_FILES = ('index.ts',)
+# Below this many components, starting worker processes costs more than it saves
+PARALLEL_RENDER_THRESHOLD = 50
+SCHEMA_CACHE_DIR = Path.home() / '.cache' / 'schema-registry'
+
+# Templates are parsed once per process and their compiled bytecode is kept
+# in Jinja's private per-user cache directory, so later runs skip the lex/parse/compile step.
+env = Environment(
+    loader=FileSystemLoader(TEMPLATE_DIR),
+    auto_reload=False,
+    cache_size=-1,
+    bytecode_cache=FileSystemBytecodeCache(),
+    trim_blocks=True,
+    lstrip_blocks=True
+)
+
+# Leaf emissions, shared by every node that resolves to them
+_ZOD_UNKNOWN: Final = 'z.unknown()'
+_ZOD_STRING: Final = 'z.string()'
+_ZOD_DATETIME: Final = 'z.string().datetime()'
+_ZOD_EMAIL: Final = 'z.string().email()'
+_ZOD_UUID: Final = 'z.string().uuid()'
+_ZOD_INT: Final = 'z.number().int()'
+_ZOD_BOOL: Final = 'z.boolean()'
+_TS_UNKNOWN: Final = 'unknown'
+_TS_STRING: Final = 'string'
+_TS_NUMBER: Final = 'number'
+_TS_BOOL: Final = 'boolean'
 
 def snake_to_camel(snake_str: str) -> str:
     components = snake_str.split('_')
     return components[0] + ''.join(x.title() for x in components[1:])
 
-def generate_zod_schema(schema: Dict[str, Any], name: str) -> str:
-    if 'type' not in schema:
-        return f'z.unknown()'
-
-    if schema['type'] == 'object':
-        properties = schema.get('properties', {})
-        required = schema.get('required', [])
-        fields = []
-        for prop_name, prop_schema in properties.items():
-            is_required = prop_name in required
-            if '$ref' in prop_schema:
-                ref_name = prop_schema['$ref'].split('/')[-1]
-                field_schema = f'{ref_name}Schema'
-            else:
-                field_schema = generate_zod_schema(prop_schema, f'{name}_{prop_name}')
-            
-            if is_required:
-                fields.append(f'  {prop_name}: {field_schema}')
-            else:
-                fields.append(f'  {prop_name}: {field_schema}.optional()')
-        
-        return f'z.object({{\n{",\\n".join(fields)}\n}})'
-    
-    elif schema['type'] == 'array':
-        items_schema = generate_zod_schema(schema['items'], f'{name}_item')
-        return f'z.array({items_schema})'
-    
-    elif schema['type'] == 'string':
-        if 'enum' in schema:
-            enum_values = [f'"{v}"' for v in schema['enum']]
-            return f'z.enum([{", ".join(enum_values)}])'
-        elif schema.get('format') == 'date-time':
-            return 'z.string().datetime()'
-        elif schema.get('format') == 'date':
-            return 'z.string()'  # Could add custom validation for date format
-        elif schema.get('format') == 'email':
-            return 'z.string().email()'
-        elif schema.get('format') == 'uuid':
-            return 'z.string().uuid()'
-        return 'z.string()'
-    
-    elif schema['type'] == 'integer':
-        return 'z.number().int()'
-    
-    elif schema['type'] == 'boolean':
-        return 'z.boolean()'
-    
-    return 'z.unknown()'
-
-def generate_typescript_interface(schema: Dict[str, Any], name: str) -> str:
-    if 'type' not in schema or schema['type'] != 'object':
-        return ''
-
+def generate_zod_schema(schema: Dict[str, Any], name: str, memo: Optional[Dict[int, str]] = None,
+                        visited: Optional[Dict[int, Optional[str]]] = None) -> str:
+    # Shared sub-schemas are the same dict object wherever they are reached,
+    # so each node is only emitted once per memo
+    if memo is None:
+        memo = {}
+    key = id(schema)
+    if key in memo:
+        return memo[key]
+
+    # visited holds the nodes on the current path; only the top-level node is
+    # declared as {name}Schema and can be referenced lazily on a back-edge
+    declared = None
+    if visited is None:
+        visited = {}
+        declared = name
+    if key in visited:
+        target = visited[key]
+        return f'z.lazy(() => {target}Schema)' if target else _ZOD_UNKNOWN
+
+    visited[key] = declared
+    try:
+        memo[key] = _zod_schema(schema, name, memo, visited)
+    finally:
+        del visited[key]
+    return memo[key]
+
+def _zod_schema(schema: Dict[str, Any], name: str, memo: Dict[int, str],
+                visited: Dict[int, Optional[str]]) -> str:
+    if '$ref' in schema:
+        # Components are declared after the components they reference, and
+        # recursive ones are wrapped in z.lazy, so the name is always bound
+        return f"{schema['$ref'].split('/')[-1]}Schema"
+
+    kind = _schema_kind(schema)
+    handler = _ZOD_HANDLERS.get(kind)
+    if handler is not None:
+        return handler(schema, name, memo, visited)
+    if kind == 'string':
+        return _ZOD_STRING_FORMATS.get(schema.get('format'), _ZOD_STRING)
+    return _ZOD_SCALARS.get(kind, _ZOD_UNKNOWN)
+
+def _zod_object(schema: Dict[str, Any], name: str, memo: Dict[int, str],
+                visited: Dict[int, Optional[str]]) -> str:
     properties = schema.get('properties', {})
+    required = set(schema.get('required', []))
     fields = []
-    
     for prop_name, prop_schema in properties.items():
-        ts_type = get_typescript_type(prop_schema, f'{name}_{prop_name}')
-        description = prop_schema.get('description', '')
-        if description:
-            fields.append(f'  /** {description} */')
-        fields.append(f'  {prop_name}?: {ts_type};')
-    
-    return f'''/**
- * {schema.get("description", f"Represents a {name}")}
- * @interface {name}
- */
-export interface {name} {{
-{chr(10).join(fields)}
-}}'''
+        field_schema = generate_zod_schema(prop_schema, f'{name}_{prop_name}', memo, visited)
+        if prop_name in required:
+            fields.append(f'  {prop_name}: {field_schema}')
+        else:
+            fields.append(f'  {prop_name}: {field_schema}.optional()')
+
+    body = ',\n'.join(fields)
+    return f'z.object({{\n{body}\n}})'
+
+def _zod_array(schema: Dict[str, Any], name: str, memo: Dict[int, str],
+               visited: Dict[int, Optional[str]]) -> str:
+    items_schema = generate_zod_schema(schema['items'], f'{name}_item', memo, visited)
+    return f'z.array({items_schema})'
+
+def _zod_enum(schema: Dict[str, Any], name: str, memo: Dict[int, str],
+              visited: Dict[int, Optional[str]]) -> str:
+    enum_values = [json.dumps(str(v)) for v in schema['enum']]
+    return f'z.enum([{", ".join(enum_values)}])'
+
+def _schema_kind(schema: Dict[str, Any]) -> Optional[str]:
+    """The dispatch key for a schema node: its type, or 'enum' for string enums"""
+    kind = schema.get('type')
+    if kind == 'string' and 'enum' in schema:
+        return 'enum'
+    return kind
+
+_ZOD_HANDLERS: Final = {
+    'object': _zod_object,
+    'array': _zod_array,
+    'enum': _zod_enum
+}
+_ZOD_STRING_FORMATS: Final = {
+    'date-time': _ZOD_DATETIME,
+    'date': _ZOD_STRING,  # Could add custom validation for date format
+    'email': _ZOD_EMAIL,
+    'uuid': _ZOD_UUID
+}
+_ZOD_SCALARS: Final = {
+    'integer': _ZOD_INT,
+    'boolean': _ZOD_BOOL
+}
 
-def get_typescript_type(schema: Dict[str, Any], name: str) -> str:
+def generate_typescript_interface(schema: Dict[str, Any], name: str,
+                                  memo: Optional[Dict[Tuple[int, str], str]] = None) -> str:
+    if 'type' not in schema or schema['type'] != 'object':
+        return ''
+
+    if memo is None:
+        memo = {}
+    return TypeScriptGenerator.template('_interface_tpl').render(name=name, schema=schema, memo=memo)
+
+def get_typescript_type(schema: Dict[str, Any], name: str,
+                        memo: Optional[Dict[Tuple[int, str], str]] = None,
+                        visited: Optional[Set[int]] = None) -> str:
+    # Inline objects are typed by the name they are reached under, so the
+    # name is part of the key
+    if memo is None:
+        memo = {}
+    if visited is None:
+        visited = set()
+    key = (id(schema), name)
+    if key in memo:
+        return memo[key]
+    if id(schema) in visited:
+        # An array that (through aliases) contains itself
+        return _TS_UNKNOWN
+
+    visited.add(id(schema))
+    try:
+        memo[key] = _typescript_type(schema, name, memo, visited)
+    finally:
+        visited.discard(id(schema))
+    return memo[key]
+
+def _typescript_type(schema: Dict[str, Any], name: str, memo: Dict[Tuple[int, str], str],
+                     visited: Set[int]) -> str:
     if '$ref' in schema:
         return schema['$ref'].split('/')[-1]
     
-    if 'type' not in schema:
-        return 'unknown'
-
-    if schema['type'] == 'object':
-        return name
-    
-    if schema['type'] == 'array':
-        item_type = get_typescript_type(schema['items'], f'{name}_item')
-        return f'{item_type}[]'
-    
-    if schema['type'] == 'string':
-        if 'enum' in schema:
-            return ' | '.join([f'"{v}"' for v in schema['enum']])
-        return 'string'
-    
-    if schema['type'] == 'integer':
-        return 'number'
-    
-    if schema['type'] == 'boolean':
-        return 'boolean'
-    
-    return 'unknown'
+    kind = _schema_kind(schema)
+    handler = _TS_HANDLERS.get(kind)
+    if handler is not None:
+        return handler(schema, name, memo, visited)
+    return _TS_SCALARS.get(kind, _TS_UNKNOWN)
+
+def _ts_array(schema: Dict[str, Any], name: str, memo: Dict[Tuple[int, str], str],
+              visited: Set[int]) -> str:
+    item_type = get_typescript_type(schema['items'], f'{name}_item', memo, visited)
+    return f'{item_type}[]'
+
+def _ts_enum(schema: Dict[str, Any], name: str, memo: Dict[Tuple[int, str], str],
+             visited: Set[int]) -> str:
+    return ' | '.join([json.dumps(str(v)) for v in schema['enum']])
+
+_TS_HANDLERS: Final = {
+    # Inline objects get an interface named after the path they are reached by
+    'object': lambda schema, name, memo, visited: name,
+    'array': _ts_array,
+    'enum': _ts_enum
+}
+_TS_SCALARS: Final = {
+    'string': _TS_STRING,
+    'integer': _TS_NUMBER,
+    'boolean': _TS_BOOL
+}
 
 def generate_type_guard(name: str) -> str:
-    return f'''
-// Type guard to check if an object is a valid {name}
-// @param obj The object to check
-// @returns True if the object is a valid {name}
-export function is{name}(obj: any): obj is {name} {{
-  try {{
-    {name}Schema.parse(obj);
-    return true;
-  }} catch (error) {{
-    return false;
-  }}
-}}'''
-
-def generate_typescript_bindings(schema_file: str, output_dir: str):
-    # Read the OpenAPI schema
-    with open(schema_file, 'r') as f:
-        openapi_schema = yaml.safe_load(f)
-
-    # Get the schema components
-    components = openapi_schema['components']['schemas']
-
-    # Generate models.ts
-    models_content = ['/** ISO8601 DateTime string (e.g. "2023-12-18T23:49:38-08:00") */',
-                     'export type ISO8601DateTime = string;',
-                     '',
-                     '/** UUID string */',
-                     'export type UUID = string;',
-                     '']
-
+    return TypeScriptGenerator.template('_guard_tpl').render(name=name)
+
+env.filters['snake_to_camel'] = snake_to_camel
+env.filters['ts_type'] = get_typescript_type
+env.filters['zod_schema'] = generate_zod_schema
+
+def collect_refs(schema: Any, refs: Optional[Dict[str, None]] = None,
+                 seen: Optional[Set[int]] = None) -> Dict[str, None]:
+    """Collect the component names referenced anywhere under schema, in order of appearance"""
+    if refs is None:
+        refs = {}
+    if seen is None:
+        seen = set()
+    if id(schema) in seen:
+        return refs
+    seen.add(id(schema))
+
+    if isinstance(schema, dict):
+        if isinstance(schema.get('$ref'), str):
+            refs[schema['$ref'].split('/')[-1]] = None
+        for value in schema.values():
+            collect_refs(value, refs, seen)
+    elif isinstance(schema, list):
+        for value in schema:
+            collect_refs(value, refs, seen)
+    return refs
+
+def build_reference_index(components: Dict[str, Any]) -> Dict[str, List[str]]:
+    """Map each component name to the components that reference it"""
+    index: Dict[str, List[str]] = {name: [] for name in components}
     for name, schema in components.items():
-        models_content.append(generate_typescript_interface(schema, name))
-        models_content.append('')
+        for ref in collect_refs(schema):
+            if ref in index:
+                index[ref].append(name)
+    return index
 
-    for name in components.keys():
-        models_content.append(generate_type_guard(name))
-        models_content.append('')
-
-    os.makedirs(output_dir, exist_ok=True)
-    with open(os.path.join(output_dir, 'models.ts'), 'w') as f:
-        f.write('\n'.join(models_content))
-
-    # Generate validator.ts
-    validator_content = ['import { z } from "zod";',
-                        'import * as models from "./models";',
-                        '']
-
-    # First pass to declare all schemas (to handle circular references)
-    for name in components.keys():
-        validator_content.append(f'export const {name}Schema = z.lazy(() => {generate_zod_schema(components[name], name)});')
-        validator_content.append('')
+# Imports shared by marshaller.ts and unmarshaller.ts when written as separate modules
+_MODULE_IMPORTS = '''import { z } from 'zod';
+import * as models from './models';
+import * as validator from './validator';
+import { SchemaRegistryError, SchemaRegistryErrorCode, ILogger, ConsoleLogger } from './common';
 
-    with open(os.path.join(output_dir, 'validator.ts'), 'w') as f:
-        f.write('\n'.join(validator_content))
+'''
 
-    # Generate common.ts
-    common_content = '''export enum SchemaRegistryErrorCode {
+def _open_output(output_dir: str, filename: str) -> TextIO:
+    # Fragments are written straight to the file; a large buffer keeps that
+    # to a handful of write syscalls per file
+    return open(Path(output_dir, filename), 'w', buffering=1 << 20)
+
+class RenderedComponent(NamedTuple):
+    """The code generated for one component, one field per output module"""
+    interface: str
+    zod: str
+    guard: str
+    marshaller: str
+    unmarshaller: str
+
+class TypeScriptGenerator:
+    """Renders TypeScript bindings for the components of an OpenAPI schema"""
+
+    _TEMPLATE_FILES = {
+        '_interface_tpl': 'interface.j2',
+        '_zod_tpl': 'zod_schema.j2',
+        '_guard_tpl': 'type_guard.j2',
+        '_marshaller_tpl': 'marshaller.j2',
+        '_unmarshaller_tpl': 'unmarshaller.j2'
+    }
+
+    # Compiled templates, shared by every instance for the life of the process
+    _interface_tpl: Optional[Template] = None
+    _zod_tpl: Optional[Template] = None
+    _guard_tpl: Optional[Template] = None
+    _marshaller_tpl: Optional[Template] = None
+    _unmarshaller_tpl: Optional[Template] = None
+
+    def __init__(self, components: Dict[str, Any], bundle: bool = False):
+        self.components = components
+        # A bundle is a single index.ts, so nothing is namespaced by module
+        self.bundle = bundle
+        self._models_ns = '' if bundle else 'models.'
+        self._validator_ns = '' if bundle else 'validator.'
+        # id()-keyed memos; valid for as long as self.components is alive
+        self._zod_memo: Dict[int, str] = {}
+        self._type_memo: Dict[Tuple[int, str], str] = {}
+
+        self._referrers = build_reference_index(components)
+        self._recursive = {name for name in components if self._is_recursive(name)}
+        self._order = self._declaration_order()
+
+    def _is_recursive(self, name: str) -> bool:
+        """Whether name is reachable from itself through $ref back-edges"""
+        pending = list(self._referrers[name])
+        seen: Set[str] = set()
+        while pending:
+            referrer = pending.pop()
+            if referrer == name:
+                return True
+            if referrer not in seen:
+                seen.add(referrer)
+                pending.extend(self._referrers[referrer])
+        return False
+
+    def _declaration_order(self) -> List[str]:
+        """Order components so each is declared after the schemas it references.
+
+        Recursive components are declared through z.lazy, whose body is only
+        evaluated on first use, so only the references of the others constrain
+        the order.
+        """
+        sorter: TopologicalSorter = TopologicalSorter()
+        for name in self.components:
+            sorter.add(name)
+        for ref, referrers in self._referrers.items():
+            for referrer in referrers:
+                if referrer not in self._recursive:
+                    sorter.add(referrer, ref)
+        return list(sorter.static_order())
+
+    @classmethod
+    def template(cls, attr: str) -> Template:
+        """Get the compiled template stored in attr, compiling it on first use"""
+        template = getattr(cls, attr, None) or env.get_template(cls._TEMPLATE_FILES[attr])
+        setattr(cls, attr, template)
+        return template
+
+    def generate(self, output_dir: str) -> None:
+        """Write the TypeScript bindings to output_dir"""
+        os.makedirs(output_dir, exist_ok=True)
+
+        rendered = self._render_components()
+
+        # common comes first: the marshaller classes instantiate ConsoleLogger
+        # when they are defined
+        sections = (
+            ('common', self._write_common, ()),
+            ('models', self._write_models, (rendered,)),
+            ('validator', self._write_validator, (rendered,)),
+            ('marshaller', self._write_marshaller, (rendered,)),
+            ('unmarshaller', self._write_unmarshaller, (rendered,))
+        )
+
+        if self.bundle:
+            with _open_output(output_dir, 'index.ts') as f:
+                f.write('import { z } from "zod";\n')
+                for section, writer, args in sections:
+                    f.write(f'\n// ---- {section} ----\n\n')
+                    writer(f, *args)
+            return
+
+        # Each file only reads the rendered fragments and the compiled
+        # templates, so they are written concurrently; file writes release the GIL
+        with ThreadPoolExecutor(max_workers=len(sections)) as executor:
+            futures = [executor.submit(self._write_file, output_dir, f'{section}.ts', writer, args)
+                       for section, writer, args in sections]
+        for future in futures:
+            future.result()
+
+    @staticmethod
+    def _write_file(output_dir: str, filename: str, writer: Callable[..., None], args: Tuple[Any, ...]) -> None:
+        with _open_output(output_dir, filename) as f:
+            writer(f, *args)
+
+    def _render_components(self) -> Dict[str, RenderedComponent]:
+        """Render every component, spreading large specs across processes"""
+        names = list(self.components)
+        if len(names) <= PARALLEL_RENDER_THRESHOLD:
+            return {name: self.render_component(name) for name in names}
+
+        # Each worker builds its own generator (and memos) once, so only the
+        # component names and rendered strings cross the process boundary
+        with multiprocessing.Pool(initializer=_init_render_worker,
+                                  initargs=(self.components, self.bundle)) as pool:
+            results = pool.map(_render_in_worker, names)
+        return dict(zip(names, results))
+
+    def render_component(self, name: str) -> RenderedComponent:
+        """Render the interface, zod schema, type guard, marshal and unmarshal code for one component"""
+        schema = self.components[name]
+        return RenderedComponent(
+            interface=generate_typescript_interface(schema, name, self._type_memo),
+            zod=self.template('_zod_tpl').render(name=name, schema=schema, memo=self._zod_memo,
+                                                 lazy=name in self._recursive),
+            guard=generate_type_guard(name),
+            marshaller=self.template('_marshaller_tpl').render(
+                name=name, models_ns=self._models_ns, validator_ns=self._validator_ns),
+            unmarshaller=self.template('_unmarshaller_tpl').render(
+                name=name, models_ns=self._models_ns, validator_ns=self._validator_ns)
+        )
+
+    def _write_models(self, f: TextIO, rendered: Dict[str, RenderedComponent]) -> None:
+        """Generate models.ts"""
+        f.write('/** ISO8601 DateTime string (e.g. "2023-12-18T23:49:38-08:00") */\n'
+                'export type ISO8601DateTime = string;\n'
+                '\n'
+                '/** UUID string */\n'
+                'export type UUID = string;\n')
+        for component in rendered.values():
+            f.write('\n')
+            f.write(component.interface)
+            f.write('\n')
+        for component in rendered.values():
+            f.write('\n')
+            f.write(component.guard)
+            f.write('\n')
+
+    def _write_validator(self, f: TextIO, rendered: Dict[str, RenderedComponent]) -> None:
+        """Generate validator.ts"""
+        if not self.bundle:
+            f.write('import { z } from "zod";\n'
+                    'import * as models from "./models";\n')
+        for name in self._order:
+            f.write('\n')
+            f.write(rendered[name].zod)
+            f.write('\n')
+
+    def _write_common(self, f: TextIO) -> None:
+        """Generate common.ts"""
+        f.write('''export enum SchemaRegistryErrorCode {
   VALIDATION_ERROR = 'VALIDATION_ERROR',
   PARSE_ERROR = 'PARSE_ERROR',
   MARSHAL_ERROR = 'MARSHAL_ERROR',
@@ -204,18 +470,14 @@ export class ConsoleLogger implements ILogger {
   error(message: string, context?: Record<string, unknown>): void {
     console.error(message, context);
   }
-}'''
-
-    with open(os.path.join(output_dir, 'common.ts'), 'w') as f:
-        f.write(common_content)
-
-    # Generate marshaller.ts and unmarshaller.ts
-    marshaller_content = '''import { z } from 'zod';
-import * as models from './models';
-import * as validator from './validator';
-import { SchemaRegistryError, SchemaRegistryErrorCode, ILogger, ConsoleLogger } from './common';
+}
+''')
 
-/**
+    def _write_marshaller(self, f: TextIO, rendered: Dict[str, RenderedComponent]) -> None:
+        """Generate marshaller.ts"""
+        if not self.bundle:
+            f.write(_MODULE_IMPORTS)
+        f.write('''/**
  * Marshaller class for converting TypeScript objects to JSON strings
  */
 export class Marshaller {
@@ -228,14 +490,17 @@ export class Marshaller {
   static setLogger(logger: ILogger) {
     this.logger = logger;
   }
-'''
-
-    unmarshaller_content = '''import { z } from 'zod';
-import * as models from './models';
-import * as validator from './validator';
-import { SchemaRegistryError, SchemaRegistryErrorCode, ILogger, ConsoleLogger } from './common';
-
-/**
+''')
+        for component in rendered.values():
+            f.write(component.marshaller)
+            f.write('\n')
+        f.write('}\n')
+
+    def _write_unmarshaller(self, f: TextIO, rendered: Dict[str, RenderedComponent]) -> None:
+        """Generate unmarshaller.ts"""
+        if not self.bundle:
+            f.write(_MODULE_IMPORTS)
+        f.write('''/**
  * Unmarshaller class for converting JSON strings to TypeScript objects
  */
 export class Unmarshaller {
@@ -248,93 +513,104 @@ export class Unmarshaller {
   static setLogger(logger: ILogger) {
     this.logger = logger;
   }
-'''
-
-    for name in components.keys():
-        # Add marshal method
-        marshaller_content += f'''
-  /**
-   * Marshal a {name} object to JSON string
-   * @param data - The {name} object to marshal
-   * @returns JSON string representation of the object
-   * @throws {{SchemaRegistryError}} If validation or marshalling fails
-   */
-  static marshal{name}(data: models.{name}): string {{
-    try {{
-      this.logger.debug('Marshalling {name}', {{ data }});
-      validator.{name}Schema.parse(data);
-      const json = JSON.stringify(data);
-      this.logger.debug('Successfully marshalled {name}');
-      return json;
-    }} catch (error) {{
-      if (error instanceof z.ZodError) {{
-        throw new SchemaRegistryError(
-          SchemaRegistryErrorCode.VALIDATION_ERROR,
-          `Invalid {name} data: ${{error.message}}`,
-          error
-        );
-      }}
-      throw new SchemaRegistryError(
-        SchemaRegistryErrorCode.MARSHAL_ERROR,
-        `Failed to marshal {name}: ${{error instanceof Error ? error.message : 'Unknown error'}}`,
-        error
-      );
-    }}
-  }}
-'''
+''')
+        for component in rendered.values():
+            f.write(component.unmarshaller)
+            f.write('\n')
+        f.write('}\n')
+
+_worker_generator: Optional[TypeScriptGenerator] = None
+
+def _init_render_worker(components: Dict[str, Any], bundle: bool) -> None:
+    global _worker_generator
+    _worker_generator = TypeScriptGenerator(components, bundle)
+
+def _render_in_worker(name: str) -> RenderedComponent:
+    return _worker_generator.render_component(name)
+
+def load_schema(schema_file: str) -> Dict[str, Any]:
+    """Load an OpenAPI schema, reusing the parsed copy cached for identical content"""
+    with open(schema_file, 'rb') as f:
+        data = f.read()
+
+    cache_file = SCHEMA_CACHE_DIR / f'{hashlib.blake2b(data).hexdigest()}.pkl'
+    try:
+        with open(cache_file, 'rb') as f:
+            return pickle.load(f)
+    except Exception:
+        # Missing, truncated or written by an incompatible Python; parse the YAML instead
+        pass
+
+    schema = yaml.load(data, Loader=SafeLoader)
+
+    # The cache is best-effort; write to a temp file so a concurrent run never
+    # reads a partial pickle
+    tmp_path = None
+    try:
+        SCHEMA_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=SCHEMA_CACHE_DIR, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(schema, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_file)
+        tmp_path = None
+    except Exception:
+        pass
+    finally:
+        # Don't leave a temp file behind when the dump or the rename failed
+        if tmp_path is not None:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+
+    return schema
+
+def input_fingerprint(schema_file: str, bundle: bool) -> str:
+    """Digest of everything the generated output depends on"""
+    digest = hashlib.sha256()
+    digest.update(b'bundle' if bundle else b'modules')
+    for path in (Path(schema_file), Path(__file__).resolve(), *sorted(TEMPLATE_DIR.glob('*.j2'))):
+        digest.update(path.name.encode())
+        digest.update(hashlib.sha256(path.read_bytes()).digest())
+    return digest.hexdigest()
+
+def is_up_to_date(output_dir: str, fingerprint: str, bundle: bool) -> bool:
+    """Whether output_dir already holds the output for fingerprint"""
+    output_dir = Path(output_dir)
+    try:
+        if (output_dir / FINGERPRINT_FILE).read_text() != fingerprint:
+            return False
+    except OSError:
+        return False
+    outputs = BUNDLE_FILES if bundle else MODULE_FILES
+    return all((output_dir / name).is_file() for name in outputs)
+
+def generate_typescript_bindings(schema_file: str, output_dir: str, bundle: bool = False, force: bool = False):
+    # Nothing to do if neither the spec nor the generator changed since the last run
+    fingerprint = input_fingerprint(schema_file, bundle)
+    if not force and is_up_to_date(output_dir, fingerprint, bundle):
+        return
 
-        # Add unmarshal method
-        unmarshaller_content += f'''
-  /**
-   * Unmarshal a JSON string to a {name} object
-   * @param json - JSON string to unmarshal
-   * @returns Unmarshalled {name} object
-   * @throws {{SchemaRegistryError}} If parsing or validation fails
-   */
-  static unmarshal{name}(json: unknown): models.{name} {{
-    try {{
-      this.logger.debug('Unmarshalling {name}', {{ json }});
-      const data = typeof json === 'string' ? JSON.parse(json) : json;
-      const validated = validator.{name}Schema.parse(data);
-      this.logger.debug('Successfully unmarshalled {name}');
-      return validated;
-    }} catch (error) {{
-      if (error instanceof SyntaxError) {{
-        throw new SchemaRegistryError(
-          SchemaRegistryErrorCode.PARSE_ERROR,
-          `Invalid JSON for {name}: ${{error.message}}`,
-          error
-        );
-      }}
-      if (error instanceof z.ZodError) {{
-        throw new SchemaRegistryError(
-          SchemaRegistryErrorCode.VALIDATION_ERROR,
-          `Invalid {name} data: ${{error.message}}`,
-          error
-        );
-      }}
-      throw new SchemaRegistryError(
-        SchemaRegistryErrorCode.UNMARSHAL_ERROR,
-        `Failed to unmarshal {name}: ${{error instanceof Error ? error.message : 'Unknown error'}}`,
-        error
-      );
-    }}
-  }}
-'''
+    # Read the OpenAPI schema
+    openapi_schema = load_schema(schema_file)
 
-    marshaller_content += '}\n'
-    unmarshaller_content += '}\n'
+    # Get the schema components
+    components = openapi_schema['components']['schemas']
 
-    with open(os.path.join(output_dir, 'marshaller.ts'), 'w') as f:
-        f.write(marshaller_content)
+    TypeScriptGenerator(components, bundle).generate(output_dir)
 
-    with open(os.path.join(output_dir, 'unmarshaller.ts'), 'w') as f:
-        f.write(unmarshaller_content)
+    # Written last so an interrupted run is regenerated next time
+    (Path(output_dir) / FINGERPRINT_FILE).write_text(fingerprint)
 
 if __name__ == '__main__':
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    root_dir = os.path.dirname(script_dir)
-    schema_file = os.path.join(root_dir, 'schemas', 'bill-event.yaml')
-    output_dir = os.path.join(root_dir, 'generated', 'typescript')
-    
-    generate_typescript_bindings(schema_file, output_dir)
+    parser = argparse.ArgumentParser(description='Generate TypeScript bindings from an OpenAPI spec')
+    parser.add_argument('--bundle', action='store_true',
+                        help='Write a single index.ts instead of one module per concern')
+    parser.add_argument('--force', action='store_true',
+                        help='Regenerate even if the inputs are unchanged')
+    args = parser.parse_args()
+
+    schema_file = ROOT_DIR / 'schemas' / 'bill-event.yaml'
+    output_dir = ROOT_DIR / 'generated' / 'typescript'
+
+    generate_typescript_bindings(schema_file, output_dir, args.bundle, args.force)
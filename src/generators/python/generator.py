@@ -1,482 +1,397 @@
 import argparse
+import functools
+import hashlib
+import io
+import json
+import logging
+import os
+import struct
+import importlib.util
+import marshal
 import sys
 import yaml
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from graphlib import CycleError, TopologicalSorter
 from pathlib import Path
-from typing import Dict, Any, Optional, List
-from jinja2 import Environment, FileSystemLoader, select_autoescape
+from types import CodeType, MappingProxyType
+from typing import Callable, Dict, Any, Final, List, Literal, Mapping, Optional, Set, TextIO, Tuple
+from jinja2 import Environment, FileSystemLoader, Template, select_autoescape
+
+log = logging.getLogger(__name__)
+
+# libyaml's C loader is much faster; fall back to the pure-Python one without it
+_YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+# The loader pulls the spec through in large reads rather than 8 KiB ones
+_READ_BUFFER_SIZE = 64 * 1024
+
+TEMPLATE_DIR = Path(__file__).parent / 'templates'
+
+# Digest of the inputs the output in a directory was generated from
+SCHEMA_HASH_FILE = '.schema_hash'
+OUTPUT_FILES = ('models.py', 'event_bridge_publisher.py', 'event_bridge_consumer.py',
+                'marshaller.py', 'validator.py', 'common.py')
+# Each output file renders in milliseconds for a handful of models, which is less than
+# it takes to pickle the generator and its context into a worker process
+PARALLEL_GENERATE_THRESHOLD = 50
+# How events reach the generated consumer: already decoded from EventBridge, or as an SQS JSON string
+EventSourceType = Literal['eventbridge', 'sqs']
+
+# Compiled templates, shared by every generator so each is only compiled once per process
+_TEMPLATES: Dict[str, Template] = {}
+
+@functools.lru_cache(maxsize=None)
+def _environment() -> Environment:
+    """The Jinja environment, created on first template use"""
+    if not TEMPLATE_DIR.exists():
+        raise ValueError(f"Template directory not found: {TEMPLATE_DIR}")
+    return Environment(
+        loader=FileSystemLoader(str(TEMPLATE_DIR)),
+        autoescape=select_autoescape(['html', 'xml']),
+        trim_blocks=True,
+        lstrip_blocks=True,
+        # Templates ship with the generator, so there is no need to stat them for changes
+        auto_reload=False,
+        cache_size=400
+    )
+
+# Module-level declaration of a pattern, compiled once when the generated module is imported
+_REGEX_DECL_TPL = '{regex} = re.compile({value!r})'
+
+# Field validator bodies; {field} is the property name, {value} the schema keyword's
+# value and {regex} the name of the property's compiled pattern. Schema values are
+# kept out of the message literals, so quotes and braces in them can't break the code
+_PATTERN_TPL = ('if not {regex}.match(v):\n'
+                '    raise ValueError("{field} must match pattern " + {regex}.pattern)\n'
+                'return v')
+_ENUM_TPL = ('if v not in {value}:\n'
+             '    raise ValueError("{field} must be one of " + repr({value}))\n'
+             'return v')
+_MINIMUM_TPL = ('if v < {value}:\n'
+                '    raise ValueError("{field} must be >= {value}")\n'
+                'return v')
+_MAXIMUM_TPL = ('if v > {value}:\n'
+                '    raise ValueError("{field} must be <= {value}")\n'
+                'return v')
+_DATETIME_TPL = ('try:\n'
+                 '    if datetime.fromisoformat(v.replace("Z", "+00:00")).tzinfo is None:\n'
+                 '        raise ValueError(v)\n'
+                 '    return v\n'
+                 'except ValueError:\n'
+                 '    raise ValueError("{field} must be a valid ISO 8601 UTC datetime")')
+# fromisoformat is much faster than strptime but also accepts other ISO 8601 shapes, such as
+# week dates (2023-W51-1) and values with a time part; the shape check pins it to YYYY-MM-DD
+_DATE_TPL = ('try:\n'
+             '    if len(v) != 10 or v[4] != "-" or v[7] != "-":\n'
+             '        raise ValueError(v)\n'
+             '    datetime.fromisoformat(v)\n'
+             '    return v\n'
+             'except ValueError:\n'
+             '    raise ValueError("{field} must be a valid ISO 8601 date (YYYY-MM-DD)")')
+
+# Import headers of the generated modules; {root_model} is the event's model
+_MODELS_PROLOGUE = """\
+from typing import Any, Dict, List, Optional
+from datetime import datetime
+from pydantic import BaseModel, field_validator
+
+
+"""
+_MARSHALLER_PROLOGUE = """\
+import json
+import operator
+from typing import Any, Dict, List, Optional
+from generated.python.models import *
+
+try:
+    import orjson
+
+    def _dumps(obj: Any) -> str:
+        return orjson.dumps(obj).decode()
+except ImportError:
+    _dumps = json.dumps
+
+
+"""
+_PUBLISHER_PROLOGUE = """\
+import boto3
+from typing import Any, Dict, List
+from generated.python.models import {root_model}
+from generated.python.marshaller import {root_model}Marshaller
+
+
+"""
+_CONSUMER_PROLOGUE = """\
+from typing import Dict, Any, Optional
+from generated.python.models import {root_model}
+from generated.python.marshaller import {root_model}Marshaller
+
+"""
+# Only consumers of SQS-delivered events decode the detail themselves
+_LOADS_IMPORT = """\
+try:
+    from orjson import loads as _loads
+except ImportError:
+    from json import loads as _loads
+
+"""
+_VALIDATOR_PROLOGUE = """\
+from typing import Any, Dict
+from datetime import datetime
+
+
+"""
+
+# Marshaller conversions per property shape; {name} is the property name, {ref_name}
+# the model it refers to and {value} the expression reading it from the input
+_SCALAR_FROM_TPL = '{value}'
+_SCALAR_TO_TPL = 'obj.{name}'
+_REF_FROM_TPL = '{ref_name}Marshaller.from_dict({value})'
+_REF_TO_TPL = '{ref_name}Marshaller.to_dict(obj.{name})'
+_REF_ARRAY_FROM_TPL = '[{ref_name}Marshaller.from_dict(item) for item in {value}]'
+_REF_ARRAY_TO_TPL = '[{ref_name}Marshaller.to_dict(x) for x in obj.{name}]'
+_SCALAR_JSON_TPL = '_dumps(obj.{name})'
+_REF_JSON_TPL = '{ref_name}Marshaller.to_json(obj.{name})'
+_REF_ARRAY_JSON_TPL = '"[" + ",".join([{ref_name}Marshaller.to_json(x) for x in obj.{name}]) + "]"'
+
+# Property kinds, as classified once by _property_kind
+SCALAR, REF_SCALAR, REF_ARRAY, LINE_ITEMS = range(4)
+# (has $ref, is an array of $refs, is lineItems) bits -> kind; a $ref wins over items
+_PROPERTY_KINDS: Final[Tuple[int, ...]] = (
+    SCALAR, SCALAR, REF_ARRAY, REF_ARRAY, REF_SCALAR, LINE_ITEMS, REF_SCALAR, LINE_ITEMS
+)
+# Kind -> (from_dict, to_dict, to_json) conversion; a lineItems $ref refers to its item model
+_MARSHALLER_TEMPLATES: Final[Tuple[Tuple[str, str, str], ...]] = (
+    (_SCALAR_FROM_TPL, _SCALAR_TO_TPL, _SCALAR_JSON_TPL),
+    (_REF_FROM_TPL, _REF_TO_TPL, _REF_JSON_TPL),
+    (_REF_ARRAY_FROM_TPL, _REF_ARRAY_TO_TPL, _REF_ARRAY_JSON_TPL),
+    (_REF_ARRAY_FROM_TPL, _REF_ARRAY_TO_TPL, _REF_ARRAY_JSON_TPL)
+)
+# Kind -> how an optional property is read; required ones come from the model's itemgetter
+_OPTIONAL_LOOKUPS: Final[Tuple[str, ...]] = (
+    'data.get("{name}")', 'data["{name}"]', 'data.get("{name}", [])', 'data.get("{name}", [])'
+)
+
+# Checked in this order for every property
+_VALIDATION_TEMPLATES = (('pattern', _PATTERN_TPL), ('enum', _ENUM_TPL))
+# Only applied to integer and number properties
+_BOUND_TEMPLATES = (('minimum', _MINIMUM_TPL), ('maximum', _MAXIMUM_TPL))
+_FORMAT_TEMPLATES: Final[Mapping[str, str]] = MappingProxyType({'date-time': _DATETIME_TPL, 'date': _DATE_TPL})
+
+# OpenAPI type -> annotation used in the generated models
+_MODEL_TYPES: Final[Mapping[str, str]] = MappingProxyType({
+    'string': 'str',
+    'integer': 'int',
+    'number': 'float',
+    'boolean': 'bool',
+    'array': 'list',
+    'object': 'dict'
+})
 
 class CodeGeneratorOptions:
-    def __init__(self, schema: Path, output_dir: Path, include_event_bridge: bool = True):
+    def __init__(self, schema: Path, output_dir: Path, include_event_bridge: bool = True,
+                 event_source_type: EventSourceType = 'eventbridge'):
         self.schema = schema
         self.output_dir = output_dir
         self.include_event_bridge = include_event_bridge
+        self.event_source_type = event_source_type
 
 class PythonGenerator:
+    __slots__ = ('schema', 'output_dir', 'include_event_bridge', 'event_source_type', '_context', '_context_schema',
+                 '_pending_writes')
+
     def __init__(self):
         self.schema: Dict[str, Any] = {}
         self.output_dir: Optional[Path] = None
         self.include_event_bridge: bool = True
-        
-        # Set up Jinja environment
-        template_dir = Path(__file__).parent / 'templates'
-        print(f"Looking for templates in: {template_dir}")
-        if not template_dir.exists():
-            raise ValueError(f"Template directory not found: {template_dir}")
-            
-        # List available templates
-        print("Available templates:")
-        for template_file in template_dir.glob('*.template'):
-            print(f"  - {template_file.name}")
-            
-        self.env = Environment(
-            loader=FileSystemLoader(str(template_dir)),
-            autoescape=select_autoescape(['html', 'xml']),
-            trim_blocks=True,
-            lstrip_blocks=True
-        )
-        
-        # Test template loading
-        try:
-            for template_name in ['base.py.template', 'models.py.template']:
-                template = self.env.get_template(template_name)
-                print(f"Successfully loaded template: {template_name}")
-        except Exception as e:
-            print(f"Error loading templates: {str(e)}")
+        self.event_source_type: EventSourceType = 'eventbridge'
+        # _process_schema output and the schema it was built from
+        self._context: Optional[Dict[str, Any]] = None
+        self._context_schema: Optional[Dict[str, Any]] = None
+        # (path, content, compiled content) waiting for _flush_writes
+        self._pending_writes: List[Tuple[Path, str, CodeType]] = []
+
+    @property
+    def env(self) -> Environment:
+        """Jinja environment for the templated outputs"""
+        return _environment()
+
+    @classmethod
+    def _template(cls, name: str) -> Template:
+        """Get a compiled template, compiling it on first use"""
+        template = _TEMPLATES.get(name)
+        if template is None:
+            template = _TEMPLATES[name] = _environment().get_template(name)
+        return template
 
     def initialize(self, options: CodeGeneratorOptions) -> None:
         self.output_dir = options.output_dir
         self.include_event_bridge = options.include_event_bridge
+        self.event_source_type = options.event_source_type
         
         # Ensure output directory exists
         self.output_dir.mkdir(parents=True, exist_ok=True)
 
         try:
-            with open(options.schema, 'r') as f:
-                self.schema = yaml.safe_load(f)
+            with open(options.schema, 'rb', buffering=_READ_BUFFER_SIZE) as f:
+                self.schema = load_spec(f)
             validate_spec(self.schema)
         except Exception as e:
             print(f"Error loading schema: {e}", file=sys.stderr)
             sys.exit(1)
 
-    def _get_python_type(self, schema: Dict[str, Any], prop_name: str = None, required_fields: List[str] = None) -> str:
-        """Get Python type for schema"""
-        type_map = {
-            'string': 'str',
-            'integer': 'int',
-            'number': 'float',
-            'boolean': 'bool',
-            'array': 'List',
-            'object': 'Dict[str, Any]'
-        }
-        
-        # Check if property is required
-        is_required = required_fields is None or prop_name in required_fields
-        
-        # Get base type
-        if schema.get('type') == 'array':
-            base_type = f"List[{self._get_python_type({'type': schema['items'].get('type', 'string')})}]"
-        else:
-            base_type = type_map.get(schema.get('type', 'string'), 'Any')
-        
-        # Make optional if not required
-        return base_type if is_required else f"Optional[{base_type}]"
+    def _ensure_context(self) -> Dict[str, Any]:
+        """Get the processed schema, processing it once per loaded schema"""
+        if self._context is None or self._context_schema is not self.schema:
+            self._context = self._process_schema()
+            self._context_schema = self.schema
+        return self._context
+
+    def _model_order(self) -> Tuple[List[str], List[str]]:
+        """
+        Model names ordered so each model comes after the models it references, and
+        the models that still reference a later one because they are part of a cycle
+        """
+        schemas = self.schema.get('components', {}).get('schemas', {})
+        graph: Dict[str, List[str]] = {}
+        for name, schema in schemas.items():
+            refs = []
+            for prop_schema in schema.get('properties', {}).values():
+                ref = prop_schema.get('$ref') or prop_schema.get('items', {}).get('$ref')
+                if ref and _ref_tail(ref) in schemas:
+                    refs.append(_ref_tail(ref))
+            graph[name] = refs
+        try:
+            return list(TopologicalSorter(graph).static_order()), []
+        except CycleError:
+            pass
+
+        # Only cut the references that close a cycle, so every other model keeps its order
+        back_edges = _back_edges(graph)
+        acyclic = {name: [ref for ref in refs if (name, ref) not in back_edges] for name, refs in graph.items()}
+        forward_refs = [name for name in graph if any((name, ref) in back_edges for ref in graph[name])]
+        return list(TopologicalSorter(acyclic).static_order()), forward_refs
 
     def _process_schema(self) -> Dict[str, Any]:
         """Process schema into template context"""
         models = []
-        type_unions = []
         
-        print("Processing schema components...")
+        log.debug("Processing schema components...")
         
         # Process each model
-        for name, schema in self.schema.get('components', {}).get('schemas', {}).items():
-            print(f"Processing model: {name}")
+        schemas = self.schema.get('components', {}).get('schemas', {})
+        order, forward_refs = self._model_order()
+        for name in order:
+            schema = schemas[name]
+            log.debug("Processing model: %s", name)
             model = {
                 'name': name,
                 'description': schema.get('description', f'Represents a {name}'),
                 'properties': [],
                 'validations': [],
-                'methods': [],
-                'model_validators': [],
+                'regexes': [],
                 'required': schema.get('required', [])
             }
             
             # Process properties
             for prop_name, prop_schema in schema.get('properties', {}).items():
-                if '$ref' in prop_schema:
-                    ref_path = prop_schema['$ref'].split('/')
-                    ref_name = ref_path[-1]
-                    prop_type = ref_name
-                else:
-                    prop_type = self._get_python_type(prop_schema, prop_name, model['required'])
-                
-                description_parts = []
-                if prop_schema.get('description'):
-                    description_parts.append(prop_schema['description'])
-                if prop_schema.get('format'):
-                    if prop_schema['format'] == 'date':
-                        description_parts.append('ISO 8601 date format (YYYY-MM-DD)')
-                    elif prop_schema['format'] == 'date-time':
-                        description_parts.append('ISO 8601 UTC date-time format (YYYY-MM-DDThh:mm:ss.sssZ)')
-                
                 prop = {
                     'name': prop_name,
-                    'type': prop_type,
-                    'description': '\n'.join(description_parts) if description_parts else None,
+                    'schema_type': prop_schema.get('type'),
+                    'model_type': self._model_type(prop_schema),
+                    'ref': _ref_name(prop_schema),
+                    'item_ref': _ref_name(prop_schema.get('items', {})) if prop_schema.get('type') == 'array' else None,
+                    'doc': prop_schema.get('description'),
                     'required': prop_name in model['required'],
-                    'default': prop_schema.get('default'),
-                    'pattern': prop_schema.get('pattern'),
-                    'format': prop_schema.get('format'),
-                    'enum': prop_schema.get('enum'),
-                    'minimum': prop_schema.get('minimum'),
-                    'maximum': prop_schema.get('maximum')
+                    'format': prop_schema.get('format')
                 }
                 model['properties'].append(prop)
                 
-                # Add validations
-                validations = []
-                
-                # Pattern validation
-                if prop_schema.get('pattern'):
-                    validations.append({
-                        'field': prop_name,
-                        'code': f'if not re.match(r"{prop_schema["pattern"]}", v):\n'
-                               f'    raise ValueError(f"{prop_name} must match pattern {prop_schema["pattern"]}")\n'
-                               f'return v'
-                    })
-                
-                # Enum validation
-                if prop_schema.get('enum'):
-                    validations.append({
-                        'field': prop_name,
-                        'code': f'if v not in {prop_schema["enum"]}:\n'
-                               f'    raise ValueError(f"{prop_name} must be one of {prop_schema["enum"]}")\n'
-                               f'return v'
-                    })
-                
-                # Number validations
-                if prop_schema.get('type') in ['integer', 'number']:
-                    if 'minimum' in prop_schema:
-                        validations.append({
-                            'field': prop_name,
-                            'code': f'if v < {prop_schema["minimum"]}:\n'
-                                   f'    raise ValueError(f"{prop_name} must be >= {prop_schema["minimum"]}")\n'
-                                   f'return v'
-                        })
-                    if 'maximum' in prop_schema:
-                        validations.append({
-                            'field': prop_name,
-                            'code': f'if v > {prop_schema["maximum"]}:\n'
-                                   f'    raise ValueError(f"{prop_name} must be <= {prop_schema["maximum"]}")\n'
-                                   f'return v'
-                        })
-                
-                # Format validations
-                if prop_schema.get('format'):
-                    if prop_schema['format'] == 'date-time':
-                        validations.append({
-                            'field': prop_name,
-                            'code': 'try:\n'
-                                   '    datetime.fromisoformat(v.replace("Z", "+00:00"))\n'
-                                   '    return v\n'
-                                   'except ValueError as e:\n'
-                                   f'    raise ValueError(f"{prop_name} must be a valid ISO 8601 datetime")'
-                        })
-                    elif prop_schema['format'] == 'date':
-                        validations.append({
-                            'field': prop_name,
-                            'code': 'try:\n'
-                                   '    datetime.strptime(v, "%Y-%m-%d")\n'
-                                   '    return v\n'
-                                   'except ValueError as e:\n'
-                                   f'    raise ValueError(f"{prop_name} must be a valid ISO 8601 date (YYYY-MM-DD)")'
-                        })
-                
-                model['validations'].extend(validations)
-            
-            # Add model validators
-            if 'x-model-validators' in schema:
-                for validator in schema['x-model-validators']:
-                    model['model_validators'].append({
-                        'name': validator['name'],
-                        'description': validator.get('description', ''),
-                        'code': validator['code']
+                # Add validations, as (schema keyword, validator body) pairs
+                get = prop_schema.get
+                values = {'field': prop_name, 'regex': f'_{name}_{prop_name}_RE'}
+                codes = []
+                if get('pattern'):
+                    values['value'] = prop_schema['pattern']
+                    model['regexes'].append({
+                        'name': values['regex'],
+                        'code': _REGEX_DECL_TPL.format_map(values)
                     })
+                for key, template in _VALIDATION_TEMPLATES:
+                    if get(key):
+                        values['value'] = prop_schema[key]
+                        codes.append((key, template.format_map(values)))
+                if get('type') in ['integer', 'number']:
+                    for key, template in _BOUND_TEMPLATES:
+                        if key in prop_schema:
+                            values['value'] = prop_schema[key]
+                            codes.append((key, template.format_map(values)))
+                format_template = _FORMAT_TEMPLATES.get(get('format'))
+                if format_template:
+                    codes.append(('format', format_template.format_map(values)))
+
+                param_type = prop['model_type'] if prop['required'] else f"Optional[{prop['model_type']}]"
+                model['validations'].extend([{
+                    'field': prop_name,
+                    'name': f'validate_{prop_name}_{key}',
+                    'kind': key,
+                    'param_type': param_type,
+                    'required': prop['required'],
+                    'code': code
+                } for key, code in codes])
             
             models.append(model)
-            
-            # Check for unions
-            if 'x-union-types' in schema:
-                type_unions.append({
-                    'name': f"{name}Types",
-                    'description': f"Union of types for {name}",
-                    'types': schema['x-union-types']
-                })
         
-        context = {
-            'models': models,
-            'type_unions': type_unions,
-            're': True  # Indicate that re module is needed
-        }
-        return context
-
-    def _generate_validator(self) -> List[str]:
-        """Generate validator code"""
-        code = [
-            'from typing import Any, Dict, List, Optional',
-            'from datetime import datetime',
-            'from .models import *',
-            '',
-            'class ValidationError(Exception):',
-            '    """Raised when event validation fails"""',
-            '    pass',
-            '',
-            'class Validator:',
-            '    """Validates events against schema"""',
-            '',
-            '    @staticmethod',
-            '    def validate_event(event_type: str, event_data: Dict[str, Any]) -> None:',
-            '        """',
-            '        Validate event data against schema',
-            '        :param event_type: Type of event (e.g., BillApproved)',
-            '        :param event_data: Event data to validate',
-            '        :raises: ValidationError if validation fails',
-            '        """',
-            '        try:',
-            '            # Validate required fields',
-            '            if "bill" not in event_data:',
-            '                raise ValidationError("Missing required field: bill")',
-            '            if "project" not in event_data:',
-            '                raise ValidationError("Missing required field: project")',
-            '            if "lineItems" not in event_data:',
-            '                raise ValidationError("Missing required field: lineItems")',
-            '            if "approval" not in event_data:',
-            '                raise ValidationError("Missing required field: approval")',
-            '            if "eventMetadata" not in event_data:',
-            '                raise ValidationError("Missing required field: eventMetadata")',
-            '',
-            '            # Validate bill fields',
-            '            bill = event_data["bill"]',
-            '            required_bill_fields = [',
-            '                "billId", "billNumber", "tradePartnerBillNumber",',
-            '                "tradePartnerId", "billType", "billSource",',
-            '                "billDate", "billStatus", "totalAmountInCents"',
-            '            ]',
-            '            for field in required_bill_fields:',
-            '                if field not in bill:',
-            '                    raise ValidationError(f"Missing required bill field: {field}")',
-            '',
-            '            # Validate date formats',
-            '            date_fields = ["billDate", "dueDate", "paidDate", "postedDate"]',
-            '            for field in date_fields:',
-            '                if field in bill and bill[field]:',
-            '                    try:',
-            '                        datetime.strptime(bill[field], "%Y-%m-%d")',
-            '                    except ValueError:',
-            '                        raise ValidationError(f"Invalid date format for {field}. Expected YYYY-MM-DD")',
-            '',
-            '            # Validate integer fields',
-            '            int_fields = ["totalAmountInCents", "amountPaidInCents"]',
-            '            for field in int_fields:',
-            '                if field in bill and bill[field] is not None:',
-            '                    if not isinstance(bill[field], int):',
-            '                        raise ValidationError(f"{field} must be an integer")',
-            '',
-            '            # Validate project fields',
-            '            project = event_data["project"]',
-            '            required_project_fields = [',
-            '                "projectId", "projectName", "lotType", "projectStatus"',
-            '            ]',
-            '            for field in required_project_fields:',
-            '                if field not in project:',
-            '                    raise ValidationError(f"Missing required project field: {field}")',
-            '',
-            '            # Validate line items',
-            '            line_items = event_data["lineItems"]',
-            '            if not isinstance(line_items, list):',
-            '                raise ValidationError("lineItems must be an array")',
-            '',
-            '            required_line_item_fields = [',
-            '                "lineId", "amountInCents", "costCodeId",',
-            '                "costCodeNumber", "costClassification"',
-            '            ]',
-            '            for item in line_items:',
-            '                for field in required_line_item_fields:',
-            '                    if field not in item:',
-            '                        raise ValidationError(f"Missing required line item field: {field}")',
-            '                if not isinstance(item["amountInCents"], int):',
-            '                    raise ValidationError("Line item amountInCents must be an integer")',
-            '',
-            '            # Validate approval',
-            '            approval = event_data["approval"]',
-            '            if "approvalStatus" not in approval:',
-            '                raise ValidationError("Missing required approval field: approvalStatus")',
-            '',
-            '            # Validate event metadata',
-            '            metadata = event_data["eventMetadata"]',
-            '            required_metadata_fields = [',
-            '                "idempotencyKey", "correlationId",',
-            '                "eventTimeStamp", "schemaVersion"',
-            '            ]',
-            '            for field in required_metadata_fields:',
-            '                if field not in metadata:',
-            '                    raise ValidationError(f"Missing required metadata field: {field}")',
-            '',
-            '            # Validate timestamp format',
-            '            try:',
-            '                datetime.strptime(metadata["eventTimeStamp"], "%Y-%m-%dT%H:%M:%S%z")',
-            '            except ValueError:',
-            '                raise ValidationError("Invalid eventTimeStamp format. Expected ISO 8601 UTC format")',
-            '',
-            '        except KeyError as e:',
-            '            raise ValidationError(f"Missing required field: {str(e)}")',
-            '        except Exception as e:',
-            '            raise ValidationError(f"Validation error: {str(e)}")',
-            ''
-        ]
-        return code
+        return {'models': models, 'forward_refs': forward_refs}
 
-    def _generate_models(self) -> str:
-        """Generate Python models from schema"""
+    def _generate_models(self, buf: TextIO) -> None:
+        """Write Python models from schema to buf"""
         if not self.schema.get('components', {}).get('schemas', {}):
             raise ValueError('No schemas found in components')
 
-        # Generate imports
-        code = [
-            'from typing import Any, Dict, List, Optional',
-            'from datetime import datetime',
-            'from pydantic import BaseModel, field_validator',
-            '',
-            ''
-        ]
+        context = self._ensure_context()
+        models = context['models']
+        regexes = [regex['code'] for model in models for regex in model['regexes']]
+        if context['forward_refs']:
+            # Models in a cycle reference a model defined after them, so annotations are
+            # left unevaluated until the model_rebuild() calls at the end of the module
+            buf.write('from __future__ import annotations\n')
+        if regexes:
+            buf.write('import re\n')
+        buf.write(_MODELS_PROLOGUE)
+        if regexes:
+            # Patterns are compiled once, when the models module is imported
+            buf.write('\n'.join(regexes))
+            buf.write('\n\n\n')
 
-        # Process each schema in dependency order
-        schemas = self.schema['components']['schemas']
-        
-        # Define model order based on dependencies
-        model_order = [
-            'Bill',
-            'Project',
-            'LineItem',
-            'Approval',
-            'Metadata',
-            'BillEvent'
-        ]
-        
-        # Generate models in order
-        for model_name in model_order:
-            if model_name in schemas:
-                code.extend(self._generate_model(model_name, schemas[model_name]))
-                code.append('')
-
-        return '\n'.join(code)
-
-    def _generate_model(self, name: str, schema: Dict[str, Any]) -> List[str]:
-        """Generate Python model code"""
-        code = [
-            'from typing import Any, Dict, List, Optional',
-            'from datetime import datetime',
-            'from pydantic import BaseModel, field_validator',
-            '',
-            ''
-        ]
+        # Processed models are already in dependency order
+        for index, model in enumerate(models):
+            # Models are separated by a blank line
+            if index:
+                buf.write('\n')
+            self._generate_model(model, buf)
 
-        # Process each schema
-        schemas = self.schema['components']['schemas']
-        for name, schema in schemas.items():
-            # Add class docstring
-            description = schema.get('description', f'Represents a {name}')
-            code.extend([
-                '"""',
-                description,
-                '"""'
-            ])
-
-            # Generate class definition
-            code.extend([
-                f'class {name}(BaseModel):',
-                ''
-            ])
+        if context['forward_refs']:
+            buf.write('\n')
+            for name in context['forward_refs']:
+                self._emit(buf, f'{name}.model_rebuild()')
 
-            # Process properties
-            properties = schema.get('properties', {})
-            required = schema.get('required', [])
-
-            for prop_name, prop_schema in properties.items():
-                # Add property docstring if description exists
-                if 'description' in prop_schema:
-                    code.extend([
-                        '    """',
-                        f'    {prop_schema["description"]}',
-                        '    """'
-                    ])
-
-                # Determine property type
-                if '$ref' in prop_schema:
-                    ref_path = prop_schema['$ref'].split('/')
-                    ref_name = ref_path[-1]
-                    prop_type = ref_name
-                elif prop_schema.get('type') == 'array':
-                    if '$ref' in prop_schema.get('items', {}):
-                        ref_path = prop_schema['items']['$ref'].split('/')
-                        ref_name = ref_path[-1]
-                        prop_type = f'List[{ref_name}]'
-                    else:
-                        item_type = prop_schema['items'].get('type', 'Any')
-                        prop_type = f'List[{self._map_type(item_type)}]'
-                else:
-                    prop_type = self._map_type(prop_schema.get('type', 'string'))
-
-                # Add property definition
-                if prop_name in required:
-                    code.append(f'    {prop_name}: {prop_type}')
-                else:
-                    default = 'None' if prop_type != 'bool' else 'False'
-                    code.append(f'    {prop_name}: Optional[{prop_type}] = {default}')
-
-            # Add extra fields configuration
-            code.extend([
-                '',
-                '    class Config:',
-                '        extra = "allow"',
-                ''
-            ])
-
-            # Add field validators for date fields
-            for prop_name, prop_schema in properties.items():
-                if prop_schema.get('format') == 'date':
-                    validator_name = f'validate_{prop_name}'
-                    is_optional = prop_name not in required
-                    param_type = f'Optional[str]' if is_optional else 'str'
-                    code.extend([
-                        '    @field_validator("' + prop_name + '")',
-                        '    def ' + validator_name + f'(cls, v: {param_type}) -> {param_type}:',
-                        '        """Validate date format"""',
-                        '        if v is None:',
-                        '            return v',
-                        '        try:',
-                        '            datetime.strptime(v, "%Y-%m-%d")',
-                        '            return v',
-                        '        except ValueError:',
-                        '            raise ValueError("Invalid date format. Use YYYY-MM-DD")',
-                        ''
-                    ])
-
-            code.append('')
-
-        return code
+    def _generate_model(self, model: Dict[str, Any], buf: TextIO) -> None:
+        """Write the class definition for a processed model to buf"""
+        buf.write(self._template('model.py.template').render(model))
+
+    def _model_type(self, prop_schema: Dict[str, Any]) -> str:
+        """Get the annotation a generated model uses for a property"""
+        if '$ref' in prop_schema:
+            return _ref_tail(prop_schema['$ref'])
+        if prop_schema.get('type') == 'array':
+            if '$ref' in prop_schema.get('items', {}):
+                return f"List[{_ref_tail(prop_schema['items']['$ref'])}]"
+            return f"List[{self._map_type(prop_schema['items'].get('type', 'Any'))}]"
+        return self._map_type(prop_schema.get('type', 'string'))
 
     def _map_type(self, type_name: str) -> str:
         """Map OpenAPI types to Python types"""
-        type_map = {
-            'string': 'str',
-            'integer': 'int',
-            'number': 'float',
-            'boolean': 'bool',
-            'array': 'list',
-            'object': 'dict'
-        }
-        return type_map.get(type_name, 'Any')
+        return _MODEL_TYPES.get(type_name, 'Any')
 
     def _get_root_model_name(self) -> str:
         """Get the root model name from schema"""
@@ -487,422 +402,646 @@ class PythonGenerator:
         root_model_name = next(iter(self.schema['components']['schemas'].keys()))
         return root_model_name
 
-    def _generate_event_publisher(self) -> str:
-        """Generate event publisher code"""
+    def _generate_event_publisher(self, buf: TextIO) -> None:
+        """Write event publisher code to buf"""
         root_model = self._get_root_model_name()
         
-        code = [
-            "import json",
-            "import boto3",
-            "from typing import Dict, Any",
-            f"from generated.python.models import {root_model}",
-            f"from generated.python.marshaller import {root_model}Marshaller",
-            "",
-            "",
-            "class BillEventPublisher:",
-            "    def __init__(self, event_bus_name: str, source: str = 'homebound.bills'):",
-            "        \"\"\"",
-            "        Initialize the publisher",
-            "",
-            "        Args:",
-            "            event_bus_name: Name of the EventBridge event bus",
-            "            source: Source of the event (default: homebound.bills)",
-            "        \"\"\"",
-            "        self.event_bus_name = event_bus_name",
-            "        self.source = source",
-            "        self.client = boto3.client('events')",
-            f"        self.marshaller = {root_model}Marshaller()",
-            "",
-            f"    def publish(self, event: {root_model}, event_type: str) -> Dict[str, Any]:",
-            "        \"\"\"",
-            "        Publish a bill event to EventBridge",
-            "",
-            "        Args:",
-            f"            event: The {root_model} to publish",
-            "            event_type: Type of event (e.g., 'BillApproved', 'BillReversed')",
-            "",
-            "        Returns:",
-            "            EventBridge PutEvents response",
-            "",
-            "        Raises:",
-            "            ValueError: If the event is invalid",
-            "            Exception: If there is an error publishing the event",
-            "        \"\"\"",
-            "        try:",
-            "            # Marshal the event to JSON",
-            "            event_json = self.marshaller.to_dict(event)",
-            "",
-            "            # Create the EventBridge event",
-            "            event_bridge_event = {",
-            "                'Source': self.source,",
-            "                'DetailType': event_type,",
-            "                'Detail': json.dumps(event_json),",
-            "                'EventBusName': self.event_bus_name",
-            "            }",
-            "",
-            "            # Publish the event",
-            "            response = self.client.put_events(Entries=[event_bridge_event])",
-            "",
-            "            # Check for errors",
-            "            if response['FailedEntryCount'] > 0:",
-            "                failed_entry = response['Entries'][0]",
-            "                raise Exception(f'Failed to publish event: {failed_entry.get(\"ErrorMessage\", \"Unknown error\")}')",
-            "",
-            "            return response",
-            "",
-            "        except Exception as e:",
-            "            error_msg = f'Error publishing {event_type} event: {str(e)}'",
-            "            print(error_msg)",
-            "            raise",
-            ""
-        ]
-        
-        return "\n".join(code)
+        buf.write(_PUBLISHER_PROLOGUE.format(root_model=root_model))
+        buf.write("class BillEventPublisher:\n"
+                  "    def __init__(self, event_bus_name: str, source: str = 'homebound.bills'):\n"
+                  "        \"\"\"\n"
+                  "        Initialize the publisher\n"
+                  "\n"
+                  "        Args:\n"
+                  "            event_bus_name: Name of the EventBridge event bus\n"
+                  "            source: Source of the event (default: homebound.bills)\n"
+                  "        \"\"\"\n"
+                  "        self.event_bus_name = event_bus_name\n"
+                  "        self.source = source\n"
+                  "        self.client = boto3.client('events')\n"
+                  f"        self.marshaller = {root_model}Marshaller()\n"
+                  "\n"
+                  f"    def _entry(self, event: {root_model}, event_type: str) -> Dict[str, Any]:\n"
+                  "        \"\"\"Build the PutEvents entry for an event\"\"\"\n"
+                  "        return {\n"
+                  "            'Source': self.source,\n"
+                  "            'DetailType': event_type,\n"
+                  "            'Detail': self.marshaller.to_json(event),\n"
+                  "            'EventBusName': self.event_bus_name\n"
+                  "        }\n"
+                  "\n"
+                  f"    def publish(self, event: {root_model}, event_type: str) -> Dict[str, Any]:\n"
+                  "        \"\"\"\n"
+                  "        Publish a bill event to EventBridge\n"
+                  "\n"
+                  "        Args:\n"
+                  f"            event: The {root_model} to publish\n"
+                  "            event_type: Type of event (e.g., 'BillApproved', 'BillReversed')\n"
+                  "\n"
+                  "        Returns:\n"
+                  "            EventBridge PutEvents response\n"
+                  "\n"
+                  "        Raises:\n"
+                  "            ValueError: If the event is invalid\n"
+                  "            Exception: If there is an error publishing the event\n"
+                  "        \"\"\"\n"
+                  "        try:\n"
+                  "            # Marshal the event into an EventBridge event\n"
+                  "            event_bridge_event = self._entry(event, event_type)\n"
+                  "\n"
+                  "            # Publish the event\n"
+                  "            response = self.client.put_events(Entries=[event_bridge_event])\n"
+                  "\n"
+                  "            # Check for errors\n"
+                  "            if response['FailedEntryCount'] > 0:\n"
+                  "                failed_entry = response['Entries'][0]\n"
+                  "                raise Exception(f'Failed to publish event: {failed_entry.get(\"ErrorMessage\", \"Unknown error\")}')\n"
+                  "\n"
+                  "            return response\n"
+                  "\n"
+                  "        except Exception as e:\n"
+                  "            error_msg = f'Error publishing {event_type} event: {str(e)}'\n"
+                  "            print(error_msg)\n"
+                  "            raise\n"
+                  "\n"
+                  "\n"
+                  "class BatchedBillEventPublisher(BillEventPublisher):\n"
+                  "    \"\"\"\n"
+                  "    Publisher that queues events and sends them in batched PutEvents calls\n"
+                  "\n"
+                  "    enqueue() queues an event and sends a batch once MAX_BATCH_SIZE events are\n"
+                  "    queued; flush() and leaving the publisher's with block send the rest.\n"
+                  "    publish() still sends a single event straight away.\n"
+                  "    \"\"\"\n"
+                  "\n"
+                  "    # EventBridge accepts at most 10 entries per PutEvents request\n"
+                  "    MAX_BATCH_SIZE = 10\n"
+                  "\n"
+                  "    def __init__(self, event_bus_name: str, source: str = 'homebound.bills'):\n"
+                  "        super().__init__(event_bus_name, source)\n"
+                  "        self._pending: List[Dict[str, Any]] = []\n"
+                  "\n"
+                  "    def __enter__(self) -> 'BatchedBillEventPublisher':\n"
+                  "        return self\n"
+                  "\n"
+                  "    def __exit__(self, exc_type, exc_value, traceback) -> None:\n"
+                  "        # A failing flush would hide the exception that ended the block\n"
+                  "        if exc_type is None:\n"
+                  "            self.flush()\n"
+                  "\n"
+                  f"    def enqueue(self, event: {root_model}, event_type: str) -> List[Dict[str, Any]]:\n"
+                  "        \"\"\"\n"
+                  "        Queue a bill event, sending the queue if it is full\n"
+                  "\n"
+                  "        Args:\n"
+                  f"            event: The {root_model} to publish\n"
+                  "            event_type: Type of event (e.g., 'BillApproved', 'BillReversed')\n"
+                  "\n"
+                  "        Returns:\n"
+                  "            EventBridge PutEvents responses for any batches sent\n"
+                  "        \"\"\"\n"
+                  "        self._pending.append(self._entry(event, event_type))\n"
+                  "        if len(self._pending) >= self.MAX_BATCH_SIZE:\n"
+                  "            return self.flush()\n"
+                  "        return []\n"
+                  "\n"
+                  "    def flush(self) -> List[Dict[str, Any]]:\n"
+                  "        \"\"\"\n"
+                  "        Send all queued events\n"
+                  "\n"
+                  "        Returns:\n"
+                  "            EventBridge PutEvents responses, one per batch\n"
+                  "\n"
+                  "        Raises:\n"
+                  "            Exception: If a PutEvents call fails, or EventBridge rejects any event\n"
+                  "                in a batch. Unsent and rejected events stay queued for the next flush.\n"
+                  "        \"\"\"\n"
+                  "        responses = []\n"
+                  "        while self._pending:\n"
+                  "            batch = self._pending[:self.MAX_BATCH_SIZE]\n"
+                  "            # Events are only dequeued once the call succeeds, so a failed call loses none\n"
+                  "            response = self.client.put_events(Entries=batch)\n"
+                  "            del self._pending[:len(batch)]\n"
+                  "\n"
+                  "            if response['FailedEntryCount'] > 0:\n"
+                  "                # Results line up with the request's entries; requeue the rejected ones\n"
+                  "                results = response['Entries']\n"
+                  "                self._pending[:0] = [entry for entry, result in zip(batch, results) if 'ErrorCode' in result]\n"
+                  "                failed_entry = next((result for result in results if 'ErrorCode' in result), {})\n"
+                  "                raise Exception(f'Failed to publish {response[\"FailedEntryCount\"]} event(s): {failed_entry.get(\"ErrorMessage\", \"Unknown error\")}')\n"
+                  "            responses.append(response)\n"
+                  "        return responses\n")
 
-    def _generate_event_consumer(self) -> str:
-        """Generate event consumer code"""
+    def _generate_event_consumer(self, buf: TextIO) -> None:
+        """Write event consumer code to buf"""
         root_model = self._get_root_model_name()
         
-        code = [
-            "import json",
-            "from typing import Dict, Any, Optional",
-            f"from generated.python.models import {root_model}",
-            f"from generated.python.marshaller import {root_model}Marshaller",
-            "",
-            "",
-            "class BillEventConsumer:",
-            "    def __init__(self, source: str = 'homebound.bills'):",
-            "        \"\"\"",
-            "        Initialize the consumer",
-            "",
-            "        Args:",
-            "            source: Expected source of events (default: homebound.bills)",
-            "        \"\"\"",
-            f"        self.marshaller = {root_model}Marshaller()",
-            "        self.source = source",
-            "",
-            "    def handle_event(self, event: Dict[str, Any], context: Any) -> Optional[Dict[str, Any]]:",
-            "        \"\"\"",
-            "        Handle an event from EventBridge",
-            "",
-            "        Args:",
-            "            event: The raw event from EventBridge",
-            "            context: The Lambda context",
-            "",
-            "        Returns:",
-            "            Optional response data",
-            "",
-            "        Raises:",
-            "            ValueError: If the event is invalid",
-            "        \"\"\"",
-            "        try:",
-            "            # Extract event details",
-            "            detail_type = event.get('detail-type')",
-            "            source = event.get('source')",
-            "            detail = event.get('detail')",
-            "",
-            "            if not all([detail_type, source, detail]):",
-            "                raise ValueError('Missing required event fields')",
-            "",
-            "            # Verify source",
-            "            if source != self.source:",
-            "                print(f'Ignoring event from unknown source: {source}')",
-            "                return None",
-            "",
-            "            # Unmarshal and validate the event",
-            "            event_data = self.marshaller.from_dict(detail)",
-            "",
-            "            # Handle different event types",
-            "            if detail_type == 'BillApproved':",
-            "                return self._handle_bill_approved(event_data)",
-            "            elif detail_type == 'BillReversed':",
-            "                return self._handle_bill_reversed(event_data)",
-            "            else:",
-            "                print(f'Unknown event type: {detail_type}')",
-            "                return None",
-            "",
-            "        except Exception as e:",
-            "            error_msg = f'Error handling event: {str(e)}'",
-            "            print(error_msg)",
-            "            raise",
-            "",
-            f"    def _handle_bill_approved(self, event: {root_model}) -> Dict[str, Any]:",
-            "        \"\"\"",
-            "        Handle a bill approved event",
-            "",
-            "        Args:",
-            f"            event: The {root_model} event data",
-            "",
-            "        Returns:",
-            "            Response data",
-            "        \"\"\"",
-            "        print(f'Processing BillApproved event for bill {event.bill.billId}')",
-            "        # TODO: Add your business logic here",
-            "",
-            "        return {",
-            "            'statusCode': 200,",
-            "            'body': 'Successfully processed BillApproved event'",
-            "        }",
-            "",
-            f"    def _handle_bill_reversed(self, event: {root_model}) -> Dict[str, Any]:",
-            "        \"\"\"",
-            "        Handle a bill reversed event",
-            "",
-            "        Args:",
-            f"            event: The {root_model} event data",
-            "",
-            "        Returns:",
-            "            Response data",
-            "        \"\"\"",
-            "        print(f'Processing BillReversed event for bill {event.bill.billId}')",
-            "        # TODO: Add your business logic here",
-            "",
-            "        return {",
-            "            'statusCode': 200,",
-            "            'body': 'Successfully processed BillReversed event'",
-            "        }",
-            "",
-            "# Lambda handler",
-            "def lambda_handler(event: Dict[str, Any], context: Any) -> Optional[Dict[str, Any]]:",
-            "    \"\"\"",
-            "    AWS Lambda handler for EventBridge events",
-            "",
-            "    Args:",
-            "        event: The raw event from EventBridge",
-            "        context: The Lambda context",
-            "",
-            "    Returns:",
-            "        Optional response data",
-            "    \"\"\"",
-            "    consumer = BillEventConsumer()",
-            "    return consumer.handle_event(event, context)",
-            ""
-        ]
-        
-        return "\n".join(code)
+        decodes_detail = self.event_source_type == 'sqs'
+
+        buf.write(_CONSUMER_PROLOGUE.format(root_model=root_model))
+        if decodes_detail:
+            buf.write(_LOADS_IMPORT)
+        buf.write("\n"
+                  "class BillEventConsumer:\n"
+                  "    def __init__(self, source: str = 'homebound.bills'):\n"
+                  "        \"\"\"\n"
+                  "        Initialize the consumer\n"
+                  "\n"
+                  "        Args:\n"
+                  "            source: Expected source of events (default: homebound.bills)\n"
+                  "        \"\"\"\n"
+                  f"        self.marshaller = {root_model}Marshaller()\n"
+                  "        self.source = source\n"
+                  "\n"
+                  "    def handle_event(self, event: Dict[str, Any], context: Any) -> Optional[Dict[str, Any]]:\n"
+                  "        \"\"\"\n"
+                  "        Handle an event from EventBridge\n"
+                  "\n"
+                  "        Args:\n"
+                  "            event: The raw event from EventBridge\n"
+                  "            context: The Lambda context\n"
+                  "\n"
+                  "        Returns:\n"
+                  "            Optional response data\n"
+                  "\n"
+                  "        Raises:\n"
+                  "            ValueError: If the event is invalid\n"
+                  "        \"\"\"\n"
+                  "        try:\n"
+                  "            # Extract event details\n"
+                  "            detail_type = event.get('detail-type')\n"
+                  "            source = event.get('source')\n"
+                  "            detail = event.get('detail')\n"
+                  "\n"
+                  "            if not all([detail_type, source, detail]):\n"
+                  "                raise ValueError('Missing required event fields')\n"
+                  "\n"
+                  "            # Verify source\n"
+                  "            if source != self.source:\n"
+                  "                print(f'Ignoring event from unknown source: {source}')\n"
+                  "                return None\n"
+                  "\n")
+        if decodes_detail:
+            # SQS delivers the EventBridge detail as a JSON string
+            buf.write("            detail = _loads(detail)\n"
+                      "\n")
+        buf.write("            # Unmarshal and validate the event\n"
+                  "            event_data = self.marshaller.from_dict(detail)\n"
+                  "\n"
+                  "            # Handle different event types\n"
+                  "            if detail_type == 'BillApproved':\n"
+                  "                return self._handle_bill_approved(event_data)\n"
+                  "            elif detail_type == 'BillReversed':\n"
+                  "                return self._handle_bill_reversed(event_data)\n"
+                  "            else:\n"
+                  "                print(f'Unknown event type: {detail_type}')\n"
+                  "                return None\n"
+                  "\n"
+                  "        except Exception as e:\n"
+                  "            error_msg = f'Error handling event: {str(e)}'\n"
+                  "            print(error_msg)\n"
+                  "            raise\n"
+                  "\n"
+                  f"    def _handle_bill_approved(self, event: {root_model}) -> Dict[str, Any]:\n"
+                  "        \"\"\"\n"
+                  "        Handle a bill approved event\n"
+                  "\n"
+                  "        Args:\n"
+                  f"            event: The {root_model} event data\n"
+                  "\n"
+                  "        Returns:\n"
+                  "            Response data\n"
+                  "        \"\"\"\n"
+                  "        print(f'Processing BillApproved event for bill {event.bill.billId}')\n"
+                  "        # TODO: Add your business logic here\n"
+                  "\n"
+                  "        return {\n"
+                  "            'statusCode': 200,\n"
+                  "            'body': 'Successfully processed BillApproved event'\n"
+                  "        }\n"
+                  "\n"
+                  f"    def _handle_bill_reversed(self, event: {root_model}) -> Dict[str, Any]:\n"
+                  "        \"\"\"\n"
+                  "        Handle a bill reversed event\n"
+                  "\n"
+                  "        Args:\n"
+                  f"            event: The {root_model} event data\n"
+                  "\n"
+                  "        Returns:\n"
+                  "            Response data\n"
+                  "        \"\"\"\n"
+                  "        print(f'Processing BillReversed event for bill {event.bill.billId}')\n"
+                  "        # TODO: Add your business logic here\n"
+                  "\n"
+                  "        return {\n"
+                  "            'statusCode': 200,\n"
+                  "            'body': 'Successfully processed BillReversed event'\n"
+                  "        }\n"
+                  "\n"
+                  "# Lambda handler\n"
+                  "def lambda_handler(event: Dict[str, Any], context: Any) -> Optional[Dict[str, Any]]:\n"
+                  "    \"\"\"\n"
+                  "    AWS Lambda handler for EventBridge events\n"
+                  "\n"
+                  "    Args:\n"
+                  "        event: The raw event from EventBridge\n"
+                  "        context: The Lambda context\n"
+                  "\n"
+                  "    Returns:\n"
+                  "        Optional response data\n"
+                  "    \"\"\"\n"
+                  "    consumer = BillEventConsumer()\n"
+                  "    return consumer.handle_event(event, context)\n")
 
     def _generate_marshaller(self) -> str:
         """Generate marshaller code"""
-        code = [
-            'from typing import Any, Dict, List, Optional',
-            'from generated.python.models import *',
-            '',
-            ''
-        ]
+        schemas = []
+        for name, schema in self.schema['components']['schemas'].items():
+            schema_properties = schema.get('properties', {})
+            # Required properties are fetched with one itemgetter call, which returns a
+            # bare value rather than a tuple when there is only one
+            required = [prop_name for prop_name in schema_properties if prop_name in schema.get('required', [])]
+            values = {prop_name: f'values[{index}]' if len(required) > 1 else 'values'
+                      for index, prop_name in enumerate(required)}
+            properties = [_marshaller_property(prop_name, prop_schema, values.get(prop_name))
+                          for prop_name, prop_schema in schema_properties.items()]
+            schemas.append({
+                'name': name,
+                'properties': properties,
+                'required': ', '.join(f'"{prop_name}"' for prop_name in required)
+            })
 
-        # Process each schema
-        schemas = self.schema['components']['schemas']
-        for name, schema in schemas.items():
-            # Generate marshaller class
-            code.extend([
-                f'class {name}Marshaller:',
-                '    """Marshaller for converting dictionaries to model instances"""',
-                '',
-                '    @staticmethod',
-                f'    def from_dict(data: Dict[str, Any]) -> {name}:',
-                f'        """Convert dictionary to {name} instance"""',
-                '        if not data:',
-                f'            raise ValueError("{name} data is required")',
-                f'        return {name}('
-            ])
+        return _MARSHALLER_PROLOGUE + self._template('marshaller.py.template').render(schemas=schemas)
 
-            # Process properties
-            properties = schema.get('properties', {})
-            last_prop = list(properties.keys())[-1]
-
-            for prop_name, prop_schema in properties.items():
-                if '$ref' in prop_schema:
-                    ref_path = prop_schema['$ref'].split('/')
-                    ref_name = ref_path[-1]
-                    if prop_name == 'lineItems':
-                        code.append(f'            {prop_name}=[{ref_name}Marshaller.from_dict(item) for item in data.get("{prop_name}", [])]{"," if prop_name != last_prop else ""}')
-                    else:
-                        code.append(f'            {prop_name}={ref_name}Marshaller.from_dict(data["{prop_name}"]){"," if prop_name != last_prop else ""}')
-                elif prop_schema.get('type') == 'array' and '$ref' in prop_schema.get('items', {}):
-                    ref_path = prop_schema['items']['$ref'].split('/')
-                    ref_name = ref_path[-1]
-                    code.append(f'            {prop_name}=[{ref_name}Marshaller.from_dict(item) for item in data.get("{prop_name}", [])]{"," if prop_name != last_prop else ""}')
-                else:
-                    code.append(f'            {prop_name}=data.get("{prop_name}"){"," if prop_name != last_prop else ""}')
-
-            code.extend([
-                '        )',
-                '',
-                '    @staticmethod',
-                f'    def to_dict(obj: {name}) -> Dict[str, Any]:',
-                f'        """Convert {name} instance to dictionary"""',
-                '        return {'
-            ])
-
-            # Generate to_dict method
-            for prop_name, prop_schema in properties.items():
-                if '$ref' in prop_schema:
-                    ref_path = prop_schema['$ref'].split('/')
-                    ref_name = ref_path[-1]
-                    if prop_name == 'lineItems':
-                        code.append(f'            "{prop_name}": [{ref_name}Marshaller.to_dict(x) for x in obj.{prop_name}]{"," if prop_name != last_prop else ""}')
-                    else:
-                        code.append(f'            "{prop_name}": {ref_name}Marshaller.to_dict(obj.{prop_name}){"," if prop_name != last_prop else ""}')
-                elif prop_schema.get('type') == 'array' and '$ref' in prop_schema.get('items', {}):
-                    ref_path = prop_schema['items']['$ref'].split('/')
-                    ref_name = ref_path[-1]
-                    code.append(f'            "{prop_name}": [{ref_name}Marshaller.to_dict(x) for x in obj.{prop_name}]{"," if prop_name != last_prop else ""}')
-                else:
-                    code.append(f'            "{prop_name}": obj.{prop_name}{"," if prop_name != last_prop else ""}')
-
-            code.extend([
-                '        }',
-                ''
-            ])
-
-        return '\n'.join(code)
-
-    def _generate_publisher(self) -> str:
-        """Generate publisher code"""
-        code = [
-            'import json',
-            'import boto3',
-            'from typing import Any, Dict',
-            'from generated.python.models import BillEvent',
-            'from generated.python.marshaller import BillEventMarshaller',
-            '',
-            'class BillEventPublisher:',
-            '    """Publishes bill events to EventBridge"""',
-            '',
-            '    def __init__(self, event_bus_name: str, event_source: str):',
-            '        """Initialize publisher"""',
-            '        self.event_bus_name = event_bus_name',
-            '        self.event_source = event_source',
-            '        self.client = boto3.client("events")',
-            '',
-            '    def publish(self, event: BillEvent, detail_type: str) -> Dict[str, Any]:',
-            '        """',
-            '        Publish event to EventBridge',
-            '        :param event: Event to publish',
-            '        :param detail_type: Type of event (e.g., BillApproved)',
-            '        :return: Response from EventBridge',
-            '        """',
-            '        # Convert event to JSON',
-            '        event_json = BillEventMarshaller.to_dict(event)',
-            '',
-            '        # Publish to EventBridge',
-            '        return self.client.put_events(',
-            '            Entries=[',
-            '                {',
-            '                    "Source": self.event_source,',
-            '                    "DetailType": detail_type,',
-            '                    "Detail": json.dumps(event_json),',
-            '                    "EventBusName": self.event_bus_name',
-            '                }',
-            '            ]',
-            '        )',
-            ''
-        ]
-        return '\n'.join(code)
-
-    def _generate_consumer(self) -> str:
-        """Generate consumer code"""
-        code = [
-            'import json',
-            'from typing import Dict, Any, Optional',
-            'from generated.python.models import BillEvent',
-            'from generated.python.marshaller import BillEventMarshaller',
-            '',
-            'class BillEventConsumer:',
-            '    """Consumes bill events from EventBridge"""',
-            '',
-            '    @staticmethod',
-            '    def parse_event(event: Dict[str, Any]) -> Optional[BillEvent]:',
-            '        """',
-            '        Parse event from EventBridge',
-            '        :param event: Event from EventBridge',
-            '        :return: BillEvent instance or None if parsing fails',
-            '        """',
-            '        try:',
-            '            detail = json.loads(event.get("detail", "{}")) if isinstance(event.get("detail"), str) else event.get("detail", {})',
-            '            return BillEventMarshaller.from_dict(detail)',
-            '        except Exception as e:',
-            '            print(f"Error parsing event: {str(e)}")',
-            '            return None',
-            ''
-        ]
-        return '\n'.join(code)
-
-    def _generate_validator(self) -> str:
-        """Generate validator code"""
-        code = [
-            'from typing import Any, Dict, List, Optional',
-            'from datetime import datetime',
-            'from generated.python.models import *',
-            'from generated.python.marshaller import BillEventMarshaller',
-            '',
-            'class ValidationError(Exception):',
-            '    """Raised when event validation fails"""',
-            '    pass',
-            '',
-            'class Validator:',
-            '    """Validates events against schema"""',
-            '',
-            '    @staticmethod',
-            '    def validate_event(event_type: str, event_data: Dict[str, Any]) -> None:',
-            '        """',
-            '        Validate event data against schema',
-            '        :param event_type: Type of event (e.g., BillApproved)',
-            '        :param event_data: Event data to validate',
-            '        :raises: ValidationError if validation fails',
-            '        """',
-            '        try:',
-            '            # Create and validate event instance',
-            '            BillEventMarshaller.from_dict(event_data)',
-            '        except Exception as e:',
-            '            raise ValidationError(f"Validation error: {str(e)}")',
-            ''
-        ]
-        return '\n'.join(code)
+    def _generate_publisher(self, buf: TextIO) -> None:
+        """Write publisher code to buf"""
+        buf.write('''import boto3
+from typing import Any, Dict
+from generated.python.models import BillEvent
+from generated.python.marshaller import BillEventMarshaller
+
+class BillEventPublisher:
+    """Publishes bill events to EventBridge"""
+
+    def __init__(self, event_bus_name: str, event_source: str):
+        """Initialize publisher"""
+        self.event_bus_name = event_bus_name
+        self.event_source = event_source
+        self.client = boto3.client("events")
+
+    def publish(self, event: BillEvent, detail_type: str) -> Dict[str, Any]:
+        """
+        Publish event to EventBridge
+        :param event: Event to publish
+        :param detail_type: Type of event (e.g., BillApproved)
+        :return: Response from EventBridge
+        """
+        # Convert event to JSON
+        event_json = BillEventMarshaller.to_json(event)
+
+        # Publish to EventBridge
+        return self.client.put_events(
+            Entries=[
+                {
+                    "Source": self.event_source,
+                    "DetailType": detail_type,
+                    "Detail": event_json,
+                    "EventBusName": self.event_bus_name
+                }
+            ]
+        )
+''')
+
+    def _generate_consumer(self, buf: TextIO) -> None:
+        """Write consumer code to buf"""
+        buf.write('''from typing import Dict, Any, Optional
+from generated.python.models import BillEvent
+from generated.python.marshaller import BillEventMarshaller
+
+''')
+        if self.event_source_type == 'sqs':
+            buf.write(_LOADS_IMPORT)
+            detail = '_loads(event["detail"])'
+        else:
+            # Lambda has already decoded EventBridge events
+            detail = 'event["detail"]'
+        buf.write(f'''class BillEventConsumer:
+    """Consumes bill events from EventBridge"""
+
+    @staticmethod
+    def parse_event(event: Dict[str, Any]) -> Optional[BillEvent]:
+        """
+        Parse event from EventBridge
+        :param event: Event from EventBridge
+        :return: BillEvent instance or None if parsing fails
+        """
+        try:
+            detail = {detail}
+            return BillEventMarshaller.from_dict(detail)
+        except (KeyError, ValueError) as e:
+            print(f"Error parsing event: {{str(e)}}")
+            return None
+''')
+
+    def _generate_common(self, buf: TextIO) -> None:
+        """Write the shared error types to buf"""
+        buf.write('''from enum import Enum
+from typing import Optional
+
+
+class SchemaRegistryErrorCode(str, Enum):
+    VALIDATION_ERROR = 'VALIDATION_ERROR'
+    PARSE_ERROR = 'PARSE_ERROR'
+    MARSHAL_ERROR = 'MARSHAL_ERROR'
+    UNMARSHAL_ERROR = 'UNMARSHAL_ERROR'
+
+
+class SchemaRegistryError(Exception):
+    """Raised when parsing, validating or (un)marshalling an event fails"""
+
+    def __init__(self, code: SchemaRegistryErrorCode, message: str, cause: Optional[BaseException] = None):
+        super().__init__(message)
+        self.code = code
+        self.cause = cause
+''')
+
+    def _generate_validator(self, buf: TextIO) -> None:
+        """Write a validator driven by a per-model rules table to buf"""
+        root_model = self._get_root_model_name()
+
+        buf.write(_VALIDATOR_PROLOGUE)
+        buf.write("class ValidationError(Exception):\n"
+                  "    \"\"\"Raised when event validation fails\"\"\"\n"
+                  "    pass\n"
+                  "\n"
+                  "\n")
+
+        buf.write('# Required fields, fields to format-check and nested models, per model\n'
+                  '_SCHEMA_SPEC = {\n')
+        models = self._ensure_context()['models']
+        for index, model in enumerate(models):
+            properties = model['properties']
+            rules = {
+                'required': _frozenset_literal(model['required']),
+                'dates': _frozenset_literal([p['name'] for p in properties if p['format'] == 'date']),
+                'datetimes': _frozenset_literal([p['name'] for p in properties if p['format'] == 'date-time']),
+                'ints': _frozenset_literal([p['name'] for p in properties if p['schema_type'] == 'integer']),
+                'refs': repr({p['name']: p['ref'] for p in properties if p['ref']}),
+                'lists': repr({p['name']: p['item_ref'] for p in properties if p['item_ref']})
+            }
+            self._emit(buf, f'    {model["name"]!r}: {{')
+            self._emit(buf, ',\n'.join(f'        {key!r}: {value}' for key, value in rules.items()))
+            self._emit(buf, '    },' if index < len(models) - 1 else '    }')
+        self._emit(buf, '}')
 
-    def generate(self) -> None:
-        """Generate all Python code files"""
+        buf.write("\n"
+                  "\n"
+                  "def _validate(model: str, data: Any, path: str) -> None:\n"
+                  "    \"\"\"Check data against the rules for model, then its nested models\"\"\"\n"
+                  "    if not isinstance(data, dict):\n"
+                  "        raise ValidationError(f\"{path} must be an object\")\n"
+                  "    rules = _SCHEMA_SPEC[model]\n"
+                  "\n"
+                  "    missing = rules['required'] - data.keys()\n"
+                  "    if missing:\n"
+                  "        raise ValidationError(f\"Missing required {path} fields: {', '.join(sorted(missing))}\")\n"
+                  "\n"
+                  "    for field in rules['dates'] & data.keys():\n"
+                  "        value = data[field]\n"
+                  "        if value:\n"
+                  "            try:\n"
+                  "                # fromisoformat alone also accepts week dates such as 2023-W51-1\n"
+                  "                if len(value) != 10 or value[4] != '-' or value[7] != '-':\n"
+                  "                    raise ValueError(value)\n"
+                  "                datetime.fromisoformat(value)\n"
+                  "            except (TypeError, ValueError):\n"
+                  "                raise ValidationError(f\"Invalid date format for {path}.{field}. Expected YYYY-MM-DD\")\n"
+                  "\n"
+                  "    for field in rules['datetimes'] & data.keys():\n"
+                  "        value = data[field]\n"
+                  "        if value:\n"
+                  "            try:\n"
+                  "                timestamp = datetime.fromisoformat(value.replace(\"Z\", \"+00:00\"))\n"
+                  "                # date-time fields are UTC, so a naive timestamp is rejected\n"
+                  "                if timestamp.tzinfo is None:\n"
+                  "                    raise ValueError(value)\n"
+                  "            except (AttributeError, ValueError):\n"
+                  "                raise ValidationError(f\"Invalid date-time format for {path}.{field}. Expected ISO 8601 UTC format\")\n"
+                  "\n"
+                  "    for field in rules['ints'] & data.keys():\n"
+                  "        value = data[field]\n"
+                  "        if value is not None and (not isinstance(value, int) or isinstance(value, bool)):\n"
+                  "            raise ValidationError(f\"{path}.{field} must be an integer\")\n"
+                  "\n"
+                  "    for field, ref in rules['refs'].items():\n"
+                  "        if data.get(field) is not None:\n"
+                  "            _validate(ref, data[field], f\"{path}.{field}\")\n"
+                  "\n"
+                  "    for field, ref in rules['lists'].items():\n"
+                  "        items = data.get(field)\n"
+                  "        if items is None:\n"
+                  "            continue\n"
+                  "        if not isinstance(items, list):\n"
+                  "            raise ValidationError(f\"{path}.{field} must be an array\")\n"
+                  "        for index, item in enumerate(items):\n"
+                  "            _validate(ref, item, f\"{path}.{field}[{index}]\")\n"
+                  "\n"
+                  "\n"
+                  "class Validator:\n"
+                  "    \"\"\"Validates events against schema\"\"\"\n"
+                  "\n"
+                  "    @staticmethod\n"
+                  "    def validate_event(event_type: str, event_data: Dict[str, Any]) -> None:\n"
+                  "        \"\"\"\n"
+                  "        Validate event data against schema\n"
+                  "        :param event_type: Type of event (e.g., BillApproved)\n"
+                  "        :param event_data: Event data to validate\n"
+                  "        :raises: ValidationError if validation fails\n"
+                  "        \"\"\"\n"
+                  f"        _validate({root_model!r}, event_data, {root_model!r})\n")
+
+    def generate(self, force: bool = False) -> None:
+        """Generate all Python code files, unless they are already up to date"""
         if not self.output_dir:
             raise ValueError("Output directory not set")
+
+        digest = self._schema_hash()
+        if not force and self._is_up_to_date(digest):
+            print(f"{self.output_dir} is up to date")
+            return
         
-        # Generate models
-        models_code = self._generate_models()
-        output_path = self.output_dir / 'models.py'
-        output_path.write_text(models_code)
-        print(f"Generated models.py")
-        
-        # Generate event bridge publisher
-        publisher_code = self._generate_event_publisher()
-        output_path = self.output_dir / 'event_bridge_publisher.py'
-        output_path.write_text(publisher_code)
-        print(f"Generated event_bridge_publisher.py")
-        
-        # Generate event bridge consumer
-        consumer_code = self._generate_event_consumer()
-        output_path = self.output_dir / 'event_bridge_consumer.py'
-        output_path.write_text(consumer_code)
-        print(f"Generated event_bridge_consumer.py")
-        
-        # Generate marshaller
-        marshaller_code = self._generate_marshaller()
-        output_path = self.output_dir / 'marshaller.py'
-        output_path.write_text(marshaller_code)
-        print(f"Generated marshaller.py")
-        
-        # Generate each component using templates for now
-        # TODO: Convert these to inline generation as well
-        components = [
-            ('validator.py', 'validator.py.template'),
-            ('common.py', 'common.py.template')
+        # The template context is built once here, so every worker inherits it
+        context = self._ensure_context()
+        tasks = [
+            ('models.py', self._render, self._generate_models),
+            ('event_bridge_publisher.py', self._render, self._generate_event_publisher),
+            ('event_bridge_consumer.py', self._render, self._generate_event_consumer),
+            ('marshaller.py', self._generate_marshaller),
+            ('validator.py', self._render, self._generate_validator),
+            ('common.py', self._render, self._generate_common)
         ]
-        
-        context = self._process_schema()
-        for output_file, template_file in components:
-            template = self.env.get_template(template_file)
-            output = template.render(**context)
-            output_path = self.output_dir / output_file
-            output_path.write_text(output)
-            print(f"Generated {output_file}")
+
+        # Each file only reads the schema, so large schemas are generated in parallel
+        if len(context['models']) <= PARALLEL_GENERATE_THRESHOLD:
+            results = map(_run_task, tasks)
+        else:
+            with ProcessPoolExecutor(max_workers=min(len(tasks), os.cpu_count() or 1)) as pool:
+                results = list(pool.map(_run_task, tasks))
+        for output_file, content in results:
+            self._queue_write(output_file, content)
+
+        generated_files = [output_path.name for output_path in self._flush_writes()]
+        print("Generated: " + ", ".join(generated_files))
+
+        # _is_up_to_date trusts this digest, so it is only recorded once every module
+        # and its bytecode are on disk
+        (self.output_dir / SCHEMA_HASH_FILE).write_text(digest)
+
+    def _schema_hash(self) -> str:
+        """Digest of the schema and of the generator that turns it into code"""
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(self.event_source_type.encode())
+        digest.update(json.dumps(self.schema, sort_keys=True, separators=(',', ':'), default=str).encode())
+        for path in (Path(__file__).resolve(), *sorted(TEMPLATE_DIR.glob('*.template'))):
+            digest.update(path.read_bytes())
+        return digest.hexdigest()
+
+    def _is_up_to_date(self, digest: str) -> bool:
+        """Whether the output directory already holds the output for digest"""
+        try:
+            if (self.output_dir / SCHEMA_HASH_FILE).read_text() != digest:
+                return False
+        except OSError:
+            return False
+        return all((self.output_dir / name).is_file() for name in OUTPUT_FILES)
+
+    @staticmethod
+    def _emit(buf: TextIO, line: str) -> None:
+        """Write a single generated line to buf"""
+        buf.write(line)
+        buf.write('\n')
+
+    @staticmethod
+    def _render(writer: Callable[[TextIO], None]) -> str:
+        """Run a buffer-writing generator and return its output"""
+        buf = io.StringIO()
+        writer(buf)
+        return buf.getvalue()
+
+    def _queue_write(self, filename: str, content: str) -> None:
+        """Queue content to be written to filename in the output directory"""
+        path = self.output_dir / filename
+        # Compile in memory first, so a codegen bug raises before any file is
+        # written and the output directory is never left half updated. The same
+        # code object is later cached as the module's bytecode
+        code = compile(content, str(path), 'exec', dont_inherit=True)
+        self._pending_writes.append((path, content, code))
+
+    def _flush_writes(self) -> List[Path]:
+        """Write every queued file and its bytecode, concurrently, and return their paths"""
+        pending, self._pending_writes = self._pending_writes, []
+        # Each task is a module and its .pyc, both spent waiting on the disk rather than
+        # holding the interpreter, so one thread per file overlaps all of them
+        with ThreadPoolExecutor(max_workers=max(len(pending), 1)) as executor:
+            futures = [executor.submit(_write_module, *write) for write in pending]
+        for future in futures:
+            future.result()
+        return [path for path, _, _ in pending]
+
+def _write_module(path: Path, content: str, code: CodeType) -> None:
+    """Write a generated module, then its already compiled code to __pycache__"""
+    path.write_text(content, encoding='utf-8')
+    # The .pyc header py_compile would write: magic, flags, source mtime and size
+    stat = path.stat()
+    header = importlib.util.MAGIC_NUMBER + struct.pack('<III', 0, int(stat.st_mtime) & 0xFFFFFFFF,
+                                                      stat.st_size & 0xFFFFFFFF)
+    cache_path = Path(importlib.util.cache_from_source(str(path)))
+    cache_path.parent.mkdir(exist_ok=True)
+    cache_path.write_bytes(header + marshal.dumps(code))
+
+def _run_task(task: Tuple[Any, ...]) -> Tuple[str, str]:
+    """Run one (filename, function, *args) generation task, in this or a worker process"""
+    filename, function, *args = task
+    return filename, function(*args)
+
+def _back_edges(graph: Dict[str, List[str]]) -> Set[Tuple[str, str]]:
+    """(model, reference) edges that close a cycle in a depth-first walk of graph"""
+    back_edges: Set[Tuple[str, str]] = set()
+    state: Dict[str, int] = {}  # 1 while a model is on the walk's path, 2 once it is done
+
+    def visit(name: str) -> None:
+        state[name] = 1
+        for ref in graph[name]:
+            if state.get(ref) == 1:
+                back_edges.add((name, ref))
+            elif ref not in state:
+                visit(ref)
+        state[name] = 2
+
+    for name in graph:
+        if name not in state:
+            visit(name)
+    return back_edges
+
+def _ref_tail(ref: str) -> str:
+    """Last segment of a $ref, i.e. the name of the component it references"""
+    return ref.rpartition('/')[2]
+
+def _ref_name(schema: Dict[str, Any]) -> Optional[str]:
+    """Name of the component a schema references, if it is a $ref"""
+    ref = schema.get('$ref')
+    return _ref_tail(ref) if ref else None
+
+def _frozenset_literal(names: List[str]) -> str:
+    """Source for a frozenset of names, keeping their order for stable output"""
+    if not names:
+        return 'frozenset()'
+    return 'frozenset({' + ', '.join(repr(name) for name in names) + '})'
+
+def _property_kind(prop_name: str, prop_schema: Dict[str, Any]) -> Tuple[int, Optional[str]]:
+    """Classify a property for marshalling, returning its kind and referenced model"""
+    ref = prop_schema.get('$ref')
+    item_ref = prop_schema.get('items', {}).get('$ref') if prop_schema.get('type') == 'array' else None
+    key = (ref is not None) << 2 | (item_ref is not None) << 1 | (prop_name == 'lineItems')
+    target = ref or item_ref
+    return _PROPERTY_KINDS[key], _ref_tail(target) if target else None
+
+def _marshaller_property(prop_name: str, prop_schema: Dict[str, Any], value: Optional[str]) -> Dict[str, str]:
+    """Render the from_dict, to_dict and to_json conversions for one property
+
+    value reads the property out of the required values, or is None if it is optional.
+    """
+    kind, ref_name = _property_kind(prop_name, prop_schema)
+    fields = {'name': prop_name, 'ref_name': ref_name}
+    fields['value'] = value or _OPTIONAL_LOOKUPS[kind].format_map(fields)
+    from_dict, to_dict, to_json = (tpl.format_map(fields) for tpl in _MARSHALLER_TEMPLATES[kind])
+    return {'name': prop_name, 'from_dict': from_dict, 'to_dict': to_dict, 'to_json': to_json}
+
+def _mapping_value(node: Optional[yaml.Node], key: str) -> Optional[yaml.Node]:
+    """Get the node stored under key in a composed YAML mapping"""
+    if isinstance(node, yaml.MappingNode):
+        for key_node, value_node in node.value:
+            if isinstance(key_node, yaml.ScalarNode) and key_node.value == key:
+                return value_node
+    return None
+
+def load_spec(stream) -> Any:
+    """Load an OpenAPI spec, only constructing the components.schemas subtree.
+
+    The document is composed into nodes first so paths, examples and the rest
+    of the spec are never turned into Python objects. If the spec has no
+    components.schemas mapping the whole document is constructed, so
+    validate_spec can report what is missing.
+    """
+    loader = _YAML_LOADER(stream)
+    try:
+        root = loader.get_single_node()
+        schemas = _mapping_value(_mapping_value(root, 'components'), 'schemas')
+        if schemas is None:
+            return loader.construct_document(root) if root is not None else None
+        return {'components': {'schemas': loader.construct_document(schemas)}}
+    finally:
+        loader.dispose()
 
 def validate_spec(spec: Dict[str, Any]) -> None:
     if 'components' not in spec or 'schemas' not in spec['components']:
@@ -913,18 +1052,22 @@ def main():
     parser.add_argument('--schema', required=True, type=Path, help='Path to OpenAPI schema file')
     parser.add_argument('--output', required=True, type=Path, help='Output directory')
     parser.add_argument('--event-bridge', type=bool, default=True, help='Generate AWS EventBridge integration code')
+    parser.add_argument('--event-source-type', choices=('eventbridge', 'sqs'), default='eventbridge',
+                        help='How events reach the consumer, which decides whether it decodes the detail')
+    parser.add_argument('--force', action='store_true', help='Regenerate even if the output is up to date')
 
     args = parser.parse_args()
 
     options = CodeGeneratorOptions(
         schema=args.schema,
         output_dir=args.output,
-        include_event_bridge=args.event_bridge
+        include_event_bridge=args.event_bridge,
+        event_source_type=args.event_source_type
     )
 
     generator = PythonGenerator()
     generator.initialize(options)
-    generator.generate()
+    generator.generate(force=args.force)
 
 if __name__ == '__main__':
     main()